@@ -71,3 +71,58 @@ def st_base(tmp_path, monkeypatch) -> Settings:
         VERBOSE=False,
     )
     return st
+
+
+@pytest.fixture(scope="session")
+def html_jsonld_rating() -> str:
+    """
+    Страница с JSON-LD aggregateRating (рейтинг + отзывы).
+    """
+    return """
+    <html><head>
+      <script type="application/ld+json">
+      {
+        "@context": "https://schema.org",
+        "@type": "LocalBusiness",
+        "aggregateRating": {"ratingValue":"4.9","reviewCount":"12"}
+      }
+      </script>
+    </head><body></body></html>
+    """
+
+
+@pytest.fixture(scope="session")
+def html_contacts_fast() -> str:
+    """
+    Страница с контактами: tel/mailto/itemprop url + телефон в meta description.
+    """
+    return """
+    <html><head>
+      <meta name="description" content="Звоните +7 (999) 111-22-33">
+    </head>
+    <body>
+      <a href="tel:+79992223344">Call</a>
+      <a href="mailto:test@example.com">Mail</a>
+      <a itemprop="url" href="https://site.example">Site</a>
+      <span itemprop="telephone">8 (999) 000-00-00</span>
+    </body></html>
+    """
+
+
+@pytest.fixture(scope="session")
+def html_enrich_example() -> str:
+    """
+    Карточка организации без капчи (для enrich_company_from_web).
+    """
+    return """
+    <html><head>
+      <script type="application/ld+json">
+      {"aggregateRating":{"ratingValue":"5","reviewCount":"1"}}
+      </script>
+    </head>
+    <body>
+      <a href="tel:+79990000000">Call</a>
+      <a href="mailto:x@y.ru">Mail</a>
+      <a itemprop="url" href="https://example.com">Site</a>
+    </body></html>
+    """
@@ -4,15 +4,24 @@ from ymaps_excel_export.models import RunResult
 from ymaps_excel_export.cli import main
 
 
-def test_cli_exits_1_when_error(monkeypatch, capsys, st_base):
+@pytest.fixture()
+def stub_cli(monkeypatch, st_base):
+    """
+    Подменяет Settings.from_env -> st_base и run -> RunResult с заданным request_meta.
+    """
     import ymaps_excel_export.cli as cli_mod
 
-    # Settings.from_env -> возвращаем st
     monkeypatch.setattr(cli_mod.Settings, "from_env", classmethod(lambda cls: st_base))
 
+    def _stub(request_meta):
+        monkeypatch.setattr(cli_mod, "run", lambda st: RunResult(companies=[], request_meta=request_meta))
+
+    return _stub
+
+
+def test_cli_exits_1_when_error(stub_cli, capsys):
     # run -> возвращаем ошибку
-    import ymaps_excel_export.pipeline as pipe_mod
-    monkeypatch.setattr(cli_mod, "run", lambda st: RunResult(companies=[], request_meta={"error": "boom", "saved": None, "rows": 0}))
+    stub_cli({"error": "boom", "saved": None, "rows": 0})
 
     with pytest.raises(SystemExit) as e:
         main()
@@ -23,10 +32,8 @@ def test_cli_exits_1_when_error(monkeypatch, capsys, st_base):
     assert "boom" in out
 
 
-def test_cli_not_exits_when_ok(monkeypatch, capsys, st_base):
-    import ymaps_excel_export.cli as cli_mod
-    monkeypatch.setattr(cli_mod.Settings, "from_env", classmethod(lambda cls: st_base))
-    monkeypatch.setattr(cli_mod, "run", lambda st: RunResult(companies=[], request_meta={"saved": "x.xlsx", "rows": 0}))
+def test_cli_not_exits_when_ok(stub_cli, capsys):
+    stub_cli({"saved": "x.xlsx", "rows": 0})
 
     # main() не должен падать
     main()
@@ -0,0 +1,79 @@
+import pytest
+
+from ymaps_excel_export.config import Settings
+
+
+@pytest.fixture()
+def fresh_settings_cache():
+    from ymaps_excel_export.config import _build_settings
+
+    _build_settings.cache_clear()
+    yield
+    _build_settings.cache_clear()
+
+
+def test_from_env_is_cached_until_reload(monkeypatch, fresh_settings_cache):
+    monkeypatch.setenv("TEXT", "Кафе")
+    st1 = Settings.reload()
+    assert st1.TEXT == "Кафе"
+
+    monkeypatch.setenv("TEXT", "Аптека")
+    assert Settings.from_env() is st1
+
+    st2 = Settings.reload()
+    assert st2 is not st1
+    assert st2.TEXT == "Аптека"
+
+
+def test_validate_env_only_api_key(tmp_path):
+    from ymaps_excel_export.config import _validate_env_only_api_key
+
+    env = tmp_path / ".env"
+    env.write_text("# MODE=SELENIUM\nYM_API_KEY=abc\n\n  YMAPIKEY = x=y\n", encoding="utf-8")
+    _validate_env_only_api_key(env)
+
+    env.write_text("YM_API_KEY=abc\nMODE=SELENIUM\nexport TEXT=1\n", encoding="utf-8")
+    with pytest.raises(RuntimeError, match="MODE, export TEXT"):
+        _validate_env_only_api_key(env)
+
+
+def test_validate_env_only_api_key_caches_only_success(tmp_path):
+    from ymaps_excel_export import config
+
+    env = tmp_path / ".env"
+    env.write_text("YM_API_KEY=abc\n", encoding="utf-8")
+    config._validate_env_only_api_key(env)
+    assert any(k[0] == str(env) for k in config._ENV_VALIDATED)
+
+    env.write_text("YM_API_KEY=abc\nMODE=SELENIUM\n", encoding="utf-8")
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            config._validate_env_only_api_key(env)
+
+
+def test_settings_single_definition_smoke():
+    from dataclasses import fields
+
+    from ymaps_excel_export import config
+
+    names = [f.name for f in fields(config.Settings)]
+    assert len(names) == len(set(names))
+    # каждое настраиваемое поле читается из окружения своим парсером
+    for f in fields(config.Settings):
+        if f.name not in config._ENV_SKIP_FIELDS:
+            assert f.type in config._ENV_PARSERS, f.name
+
+    h = list(config.Settings().HEADERS)
+    assert h.index("Рейтинг") + 1 == h.index("Количество оценок")
+    assert h.index("Количество оценок") + 1 == h.index("Количество отзывов")
+
+
+def test_from_env_overrides_skip_env_and_cache(monkeypatch, fresh_settings_cache):
+    monkeypatch.setenv("TEXT", "Кафе")
+    monkeypatch.setenv("MAX_SKIP", "oops")  # не должен парситься: поле передано явно
+
+    st = Settings.from_env(MAX_SKIP=5, MODE="ONLINEAPI")
+    assert st.MAX_SKIP == 5
+    assert st.MODE == "ONLINEAPI"
+    assert st.TEXT == "Кафе"
+    assert Settings.from_env(MAX_SKIP=5) is not st
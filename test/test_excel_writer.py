@@ -1,11 +1,19 @@
 import openpyxl
+import pytest
 
+from ymaps_excel_export.config import Settings
 from ymaps_excel_export.excel_writer import save_to_excel
 from ymaps_excel_export.models import Company
 
 
-def test_save_to_excel_creates_workbook(st_base, tmp_path):
-    out = tmp_path / "t.xlsx"
+@pytest.fixture(scope="module")
+def saved_workbook(tmp_path_factory):
+    """
+    Сохраняем Excel один раз на модуль и отдаём (settings, workbook).
+    """
+    tmp = tmp_path_factory.mktemp("excel")
+    st = Settings(OUT_DIR=str(tmp), VERBOSE=False)
+    out = tmp / "t.xlsx"
 
     companies = [
         Company(
@@ -18,17 +26,52 @@ def test_save_to_excel_creates_workbook(st_base, tmp_path):
     ]
 
     meta = {"hello": "world", "n": 1}
-    save_to_excel(st_base, companies, str(out), meta)
+    save_to_excel(st, companies, str(out), meta)
+
+    return st, openpyxl.load_workbook(out)
+
+
+def test_save_to_excel_creates_workbook(saved_workbook):
+    st, wb = saved_workbook
 
-    wb = openpyxl.load_workbook(out)
     assert "Организации" in wb.sheetnames
     assert "Запрос" in wb.sheetnames
 
     ws_org = wb["Организации"]
     headers = [c.value for c in ws_org[1]]
-    assert headers == st_base.HEADERS
+    assert headers == list(st.HEADERS)
 
     ws_req = wb["Запрос"]
     # Заголовок на листе запроса
     assert ws_req["A1"].value == "Параметр"
     assert ws_req["B1"].value == "Значение"
+
+
+def test_company_as_excel_values_matches_as_excel_row():
+    from ymaps_excel_export.models import EXCEL_HEADERS
+
+    c = Company(ID="1", Название="Тест", Телефон_2="+7", Количество_оценок="5", raw_json="{}")
+    row = c.as_excel_row()
+    assert tuple(row) == EXCEL_HEADERS
+    assert c.as_excel_values() == tuple(row[h] for h in EXCEL_HEADERS)
+
+
+def test_save_to_excel_typed_cells_and_layout(saved_workbook):
+    _, wb = saved_workbook
+    ws_org = wb["Организации"]
+
+    assert ws_org.freeze_panes == "A2"
+    assert ws_org.auto_filter.ref.startswith("A1:")
+    assert ws_org["A2"].value == 1
+    assert ws_org["A2"].number_format == "0"
+
+
+def test_save_to_excel_custom_headers_order(tmp_path):
+    st = Settings(OUT_DIR=str(tmp_path), VERBOSE=False, HEADERS=("Название", "ID", "Категории (прочие)"))
+    out = tmp_path / "custom.xlsx"
+
+    save_to_excel(st, [Company(ID="7", Название="Тест", Категории_прочие="x")], str(out), {})
+
+    ws = openpyxl.load_workbook(out)["Организации"]
+    assert [c.value for c in ws[1]] == list(st.HEADERS)
+    assert [c.value for c in ws[2]] == ["Тест", 7, "x"]
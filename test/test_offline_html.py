@@ -0,0 +1,121 @@
+import pytest
+
+import ymaps_excel_export.offline_html as offline_html
+from ymaps_excel_export.offline_html import parse_side_panel_items, read_offline_input, side_panel_items_from_parts
+
+
+@pytest.fixture(params=["bs4", "lexbor"])
+def html_backend(request, monkeypatch):
+    """
+    Прогоняет тест на обоих бэкендах: BeautifulSoup и selectolax (если установлен).
+    """
+    if request.param == "bs4":
+        monkeypatch.setattr(offline_html, "_lexbor_parser_cls", lambda: None)
+    else:
+        pytest.importorskip("selectolax.lexbor")
+    return request.param
+
+
+HTML_SIDE_PANEL = """
+<ul>
+  <li><div data-object="search-list-item" data-id="101" data-coordinates="37.61,55.75">
+    <div class="search-business-snippet-view__title">Кафе Ромашка</div>
+    <a class="search-business-snippet-view__address">ул. Ленина, 1</a>
+    <span class="search-business-snippet-viewcategory">Кафе</span>
+    <span class="business-rating-badge-view__rating-text _size_m">4,8</span>
+    <span class="business-rating-amount-view _summary">123 отзыва</span>
+    <span class="business-rating-amount-view _summary">598 оценок</span>
+    <a class="link-overlay" href="/maps/org/101/"></a>
+  </div></li>
+  <li><div data-object="search-list-item" data-id="102">
+    <div class="search-business-snippet-viewtitle">Без <!-- x --><b>скобок</b><script>var a = 1;</script></div>
+    <span class="business-rating-amount-view">(5 725)</span>
+  </div></li>
+  <li><div data-object="search-list-item" data-id="101">
+    <div class="search-business-snippet-view__title">Дубль</div>
+  </div></li>
+</ul>
+"""
+
+
+def test_parse_side_panel_items_fields_and_uniq(html_backend):
+    items = parse_side_panel_items(HTML_SIDE_PANEL)
+
+    assert [it["oid"] for it in items] == ["101", "102"]
+
+    first = items[0]
+    assert first["title"] == "Кафе Ромашка"
+    assert first["address"] == "ул. Ленина, 1"
+    assert first["category"] == "Кафе"
+    assert first["rating"] == "4.8"
+    assert first["rating_count"] == "598"
+    assert first["review_count"] == "123"
+    assert (first["lon"], first["lat"]) == ("37.61", "55.75")
+    assert first["href"] == "https://yandex.ru/maps/org/101/"
+
+    second = items[1]
+    assert second["title"] == "Без скобок"
+    assert second["rating_count"] == "5725"
+
+
+# HTML_SIDE_PANEL в виде частей, которые собирает JS в selenium_manual_maps
+PARTS_SIDE_PANEL = [
+    ["101", "37.61,55.75", "/maps/org/101/", [
+        ["search-business-snippet-view__title", ["Кафе Ромашка"]],
+        ["search-business-snippet-view__address", ["ул. Ленина, 1"]],
+        ["search-business-snippet-viewcategory", ["Кафе"]],
+        ["business-rating-badge-view__rating-text _size_m", ["4,8"]],
+        ["business-rating-amount-view _summary", ["123 отзыва"]],
+        ["business-rating-amount-view _summary", ["598 оценок"]],
+    ]],
+    ["102", None, "", [
+        ["search-business-snippet-viewtitle", ["Без ", "скобок"]],
+        ["business-rating-amount-view", ["(5 725)"]],
+    ]],
+    ["101", None, "", [["search-business-snippet-view__title", ["Дубль"]]]],
+]
+
+
+def test_side_panel_items_from_parts_matches_html(html_backend):
+    assert side_panel_items_from_parts(PARTS_SIDE_PANEL) == parse_side_panel_items(HTML_SIDE_PANEL)
+
+
+def test_read_offline_input_multiple_files_keeps_order_and_uniq(tmp_path, html_backend):
+    (tmp_path / "a.html").write_text(HTML_SIDE_PANEL, encoding="utf-8")
+    (tmp_path / "b.html").write_text(
+        '<div data-object="search-list-item" data-id="103">'
+        '<div class="search-business-snippet-view__title">Третья</div></div>'
+        + HTML_SIDE_PANEL,
+        encoding="utf-8",
+    )
+
+    companies, meta, err = read_offline_input(str(tmp_path))
+
+    assert err == ""
+    assert [c.ID for c in companies] == ["101", "102", "103"]
+    assert [m["source"] for m in meta["sources"]] == ["a.html", "b.html"]
+
+
+def test_parse_side_panel_items_without_cards(html_backend):
+    assert parse_side_panel_items(b'<div class="add-business-view"></div>') == []
+    assert parse_side_panel_items("") == []
+
+
+def test_read_offline_input_merges_empty_fields_from_later_snapshot(tmp_path, html_backend):
+    (tmp_path / "a.html").write_text(
+        '<div data-object="search-list-item" data-id="201">'
+        '<div class="search-business-snippet-view__title">Первый</div></div>',
+        encoding="utf-8",
+    )
+    (tmp_path / "b.html").write_text(
+        '<div data-object="search-list-item" data-id="201">'
+        '<div class="search-business-snippet-view__title">Второй</div>'
+        '<a class="search-business-snippet-view__address">ул. Мира, 5</a></div>',
+        encoding="utf-8",
+    )
+
+    companies, meta, err = read_offline_input(str(tmp_path))
+
+    assert err == "" and meta["rows"] == 1
+    assert companies[0].Название == "Первый"  # непустое поле первой записи не переписывается
+    assert companies[0].Адрес == "ул. Мира, 5"
@@ -1,22 +1,33 @@
+from dataclasses import replace
+
 import openpyxl
+import pytest
 
 from ymaps_excel_export.models import Company, RunResult
 from ymaps_excel_export.pipeline import run
 
 
-def test_pipeline_onlineapi_success_writes_excel(st_base, monkeypatch, tmp_path):
-    # Фиксируем имя файла
+@pytest.fixture()
+def stub_pipeline_io(monkeypatch):
+    """
+    Фиксирует имя файла и подменяет search_bbox заданным результатом.
+    """
     import ymaps_excel_export.pipeline as pipe
+
     monkeypatch.setattr(pipe, "now_str_for_filename", lambda: "TESTTIME")
 
-    # Мокаем API поиск
-    def fake_search_bbox(st, bbox):
-        return [Company(ID="1", Название="Org", raw_json="{}")], {"total": 1, "unique": 1}, ""
+    def _stub(companies, api_meta, err):
+        monkeypatch.setattr(pipe, "search_bbox", lambda st, bbox: (companies, api_meta, err))
+
+    return _stub
+
 
-    monkeypatch.setattr(pipe, "search_bbox", fake_search_bbox)
+def test_pipeline_onlineapi_success_writes_excel(st_base, stub_pipeline_io):
+    # Мокаем API поиск
+    stub_pipeline_io([Company(ID="1", Название="Org", raw_json="{}")], {"total": 1, "unique": 1}, "")
 
     # Отключаем web-enrich, чтобы тест был стабильнее/быстрее
-    st = st_base.__class__(**{**st_base.__dict__, "OFFLINE_ENRICH_MODE": "NONE", "MODE": "ONLINEAPI"})
+    st = replace(st_base, OFFLINE_ENRICH_MODE="NONE", MODE="ONLINEAPI")
 
     res = run(st)
     assert isinstance(res, RunResult)
@@ -29,18 +40,85 @@ def test_pipeline_onlineapi_success_writes_excel(st_base, monkeypatch, tmp_path)
     assert ws.max_row == 2  # 1 заголовок + 1 организация
 
 
-def test_pipeline_onlineapi_error_sets_error_and_rows0(st_base, monkeypatch):
-    import ymaps_excel_export.pipeline as pipe
-    monkeypatch.setattr(pipe, "now_str_for_filename", lambda: "TESTTIME")
-
-    def fake_search_bbox(st, bbox):
-        return [], {"total": 0, "unique": 0}, "Yandex API error: HTTP 403 Forbidden: Invalid apikey. Hint: ..."
-
-    monkeypatch.setattr(pipe, "search_bbox", fake_search_bbox)
+def test_pipeline_onlineapi_error_sets_error_and_rows0(st_base, stub_pipeline_io):
+    stub_pipeline_io([], {"total": 0, "unique": 0}, "Yandex API error: HTTP 403 Forbidden: Invalid apikey. Hint: ...")
 
-    st = st_base.__class__(**{**st_base.__dict__, "OFFLINE_ENRICH_MODE": "NONE", "MODE": "ONLINEAPI"})
+    st = replace(st_base, OFFLINE_ENRICH_MODE="NONE", MODE="ONLINEAPI")
 
     res = run(st)
     assert res.request_meta.get("error")
     assert res.request_meta["rows"] == 0
     assert res.request_meta.get("saved")
+
+
+def test_uri_requery_parallel_keeps_company_order(st_base, monkeypatch):
+    import ymaps_excel_export.pipeline as pipe
+    import ymaps_excel_export.yandex_api as api
+
+    def fake_fetch(st, *, uri, session=None):
+        assert session is not None  # одна keep-alive сессия на поток
+        if uri.endswith("=2"):
+            raise RuntimeError("boom")
+        return {"features": [{"uri": uri}]}
+
+    monkeypatch.setattr(pipe, "fetch_by_uri", fake_fetch)
+    monkeypatch.setattr(api, "company_from_feature", lambda f, st: Company(Сайт=f["uri"]))
+
+    companies = [Company(ID=str(i), uri=f"ymapsbm1://org?oid={i}" if i != 3 else "") for i in range(1, 5)]
+    st = replace(st_base, YMAPIKEY="k", URI_REQUERY_WORKERS=3)
+
+    stats = pipe._apply_uri_requery_if_needed(st, companies)
+
+    assert stats["attempted"] == 3
+    assert stats["changed_fields"] == 2
+    assert stats["errors"] == ["2: boom"]
+    assert [c.Сайт for c in companies] == ["ymapsbm1://org?oid=1", "", "", "ymapsbm1://org?oid=4"]
+
+
+def test_uri_requery_parallel_respects_sleep_sec(st_base, monkeypatch):
+    import time
+
+    import ymaps_excel_export.pipeline as pipe
+
+    calls = []
+
+    def fake_fetch(st, *, uri, session=None):
+        calls.append(time.monotonic())
+        return {"features": []}
+
+    monkeypatch.setattr(pipe, "fetch_by_uri", fake_fetch)
+
+    uris = [f"ymapsbm1://org?oid={i}" for i in range(4)]
+    pipe._fetch_by_uris(replace(st_base, SLEEP_SEC=0.05, URI_REQUERY_WORKERS=4), uris)
+
+    # потоков 4, но запросы всё равно не чаще одного в SLEEP_SEC
+    calls.sort()
+    assert all(b - a >= 0.04 for a, b in zip(calls, calls[1:]))
+
+
+def test_selenium_pool_closed_when_uri_requery_raises(st_base, monkeypatch):
+    import ymaps_excel_export.pipeline as pipe
+    import ymaps_excel_export.selenium_manual_maps as smm
+    import ymaps_excel_export.selenium_pool as sp
+
+    closed = []
+
+    class FakePool:
+        def __init__(self, st, *, keep_chrome_open=False):
+            pass
+
+        def close(self):
+            closed.append(True)
+
+    def boom(st, companies):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(sp, "SeleniumPool", FakePool)
+    monkeypatch.setattr(smm, "collect_companies_from_selenium_live_maps", lambda st, pool: ([Company(ID="1")], {}, ""))
+    monkeypatch.setattr(pipe, "_apply_uri_requery_if_needed", boom)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        run(replace(st_base, MODE="SELENIUM", OFFLINE_ENRICH_MODE="API"))
+
+    # Chrome/driver не утекает: пул закрыт, хотя до WEB-enrich дело не дошло
+    assert closed == [True]
@@ -0,0 +1,161 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from ymaps_excel_export.config import Settings
+from ymaps_excel_export.selenium_manual_maps import _ensure_maps_tab, _scroll_side_panel_to_end, _side_panel_parts_js
+
+
+class FakeDriver:
+    """
+    execute_script отдаёт заранее заданные состояния [cnt, h, end] по очереди.
+    """
+
+    def __init__(self, states):
+        self.states = list(states)
+        self.calls = 0
+
+    def execute_script(self, script):
+        self.calls += 1
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+
+def _st(**kw) -> Settings:
+    return Settings(
+        SELENIUM_SCROLL_STEP_SEC=0.0,
+        SELENIUM_SCROLL_MAX_SEC=5.0,
+        SELENIUM_SCROLL_STABLE_ROUNDS=2,
+        VERBOSE=False,
+        **kw,
+    )
+
+
+def test_scroll_stops_on_end_marker_one_call_per_step():
+    driver = FakeDriver([[10, 100, False], [20, 200, False], [30, 300, True]])
+
+    meta = _scroll_side_panel_to_end(driver, _st())
+
+    assert meta["items_before"] == 10
+    assert meta["items_after"] == 30
+    assert meta["end_marker_found"] is True
+    assert meta["loops"] == 2
+    # 1 стартовый замер + по одному на шаг + финальный замер
+    assert driver.calls == 4
+
+
+def test_scroll_stops_when_list_is_stable():
+    driver = FakeDriver([[10, 100, False], [15, 150, False], [15, 150, False]])
+
+    meta = _scroll_side_panel_to_end(driver, _st())
+
+    assert meta["end_marker_found"] is False
+    assert meta["stable_rounds"] == 2
+    assert meta["items_after"] == 15
+
+
+class FakeCdpDriver(FakeDriver):
+    def execute_script(self, script):  # pragma: no cover - не должен вызываться
+        raise AssertionError("execute_script must not be used when CDP is available")
+
+    def execute_cdp_cmd(self, cmd, params):
+        assert cmd == "Runtime.evaluate" and params["returnByValue"] is True
+        assert params["expression"].startswith("(function() {")
+        return {"result": {"type": "object", "value": FakeDriver.execute_script(self, params["expression"])}}
+
+
+def test_scroll_uses_cdp_runtime_evaluate_when_available():
+    driver = FakeCdpDriver([[5, 50, False], [7, 70, True]])
+
+    meta = _scroll_side_panel_to_end(driver, _st())
+
+    assert (meta["items_before"], meta["items_after"]) == (5, 7)
+    assert meta["end_marker_found"] is True
+
+
+class FakeTabsDriver:
+    """
+    Вкладки {handle: url}; switch_to.window запоминает переключения.
+    """
+
+    def __init__(self, tabs, cdp=True):
+        self.tabs = dict(tabs)
+        self.window_handles = list(self.tabs)
+        self.switched = []
+        self.current_url = ""
+        self.switch_to = self
+        if cdp:
+            self.execute_cdp_cmd = self._execute_cdp_cmd
+
+    def window(self, h):
+        self.switched.append(h)
+        self.current_url = self.tabs[h]
+
+    def _execute_cdp_cmd(self, cmd, params):
+        assert cmd == "Target.getTargets"
+        infos = [{"type": "service_worker", "targetId": "sw", "url": "https://yandex.ru/maps/sw.js"}]
+        infos += [{"type": "page", "targetId": h, "url": u} for h, u in self.tabs.items()]
+        return {"targetInfos": infos}
+
+
+_TABS = {"A": "https://example.com/", "B": "https://mail.ru/", "C": "https://yandex.ru/maps/213/moscow/"}
+
+
+def test_ensure_maps_tab_finds_tab_with_one_cdp_call():
+    driver = FakeTabsDriver(_TABS)
+
+    meta = _ensure_maps_tab(driver, "https://yandex.ru/maps/")
+
+    assert meta["found_existing_tab"] is True
+    assert meta["tab_url"] == _TABS["C"]
+    # сразу на нужную вкладку, без перебора остальных
+    assert driver.switched == ["C"]
+
+
+def test_ensure_maps_tab_without_cdp_iterates_tabs():
+    driver = FakeTabsDriver(_TABS, cdp=False)
+
+    meta = _ensure_maps_tab(driver, "https://yandex.ru/maps/")
+
+    assert meta["found_existing_tab"] is True
+    assert driver.switched == ["A", "B", "C"]
+
+
+# Минимальный DOM для _side_panel_parts_js: одна карточка с одним элементом с классом business-*.
+# Селекторы, переданные в querySelector*, пишутся в sel.
+_FAKE_DOM_JS = """
+const sel = [];
+const textNode = (v, parent) => ({nodeValue: v, parentNode: parent});
+const el = {getAttribute: () => 'business-card-title-view', nodeName: 'DIV'};
+const item = {
+  getAttribute: (k) => ({'data-id': '123', 'data-coordinates': '37.6,55.7'})[k],
+  querySelector: (s) => { sel.push(s); return {getAttribute: () => '/org/x/123/'}; },
+  querySelectorAll: (s) => { sel.push(s); return [el]; },
+};
+const document = {
+  querySelectorAll: (s) => { sel.push(s); return [item]; },
+  querySelector: (s) => { sel.push(s); return null; },
+  createTreeWalker: () => {
+    const nodes = [textNode('Org', el), textNode('x', {nodeName: 'SCRIPT'})];
+    return {nextNode: () => nodes.shift() || null};
+  },
+};
+const NodeFilter = {SHOW_TEXT: 4};
+"""
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node не установлен")
+def test_side_panel_parts_js_runs():
+    script = _side_panel_parts_js(Settings())
+    # так же, как оборачивает cdp_eval_script
+    js = f"{_FAKE_DOM_JS}\nconst res = (function() {{{script}}})();\nconsole.log(JSON.stringify([res, sel]));"
+
+    out = subprocess.run(["node", "-e", js], capture_output=True, text=True, timeout=30)
+
+    assert out.returncode == 0, out.stderr
+    (parts, end), selectors = json.loads(out.stdout)
+    assert parts == [["123", "37.6,55.7", "/org/x/123/", [["business-card-title-view", ["Org"]]]]]
+    assert end is False
+    assert Settings().SELENIUM_LIST_ITEM_CSS in selectors
+    assert '[class*="business-"]' in selectors
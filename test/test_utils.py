@@ -1,6 +1,15 @@
 import pytest
 
-from ymaps_excel_export.utils import bbox_from_center_diameter_km, oid_from_uri, safe_str
+from ymaps_excel_export.utils import (
+    RateLimiter,
+    bbox_from_center_diameter_km,
+    dedup_keep_order,
+    digits_only,
+    json_dumps_safe,
+    json_loads,
+    oid_from_uri,
+    safe_str,
+)
 
 
 def test_safe_str():
@@ -9,10 +18,16 @@ def test_safe_str():
     assert safe_str(123) == "123"
 
 
+def test_dedup_keep_order():
+    assert dedup_keep_order([" b", "a", "", None, "b", "a ", "c"]) == ["b", "a", "c"]
+
+
 def test_oid_from_uri():
     assert oid_from_uri("https://yandex.ru/maps/?oid=123") == "123"
     assert oid_from_uri("https://yandex.ru/maps/?a=1&oid=999&b=2") == "999"
     assert oid_from_uri("nope") == ""
+    assert oid_from_uri("ymapsbm1://org?oid=&oid=5") == "5"
+    assert oid_from_uri("https://yandex.ru/maps/?foid=1&oid=12abc") == "12"
 
 
 def test_bbox_from_center_diameter_km_format():
@@ -27,3 +42,34 @@ def test_bbox_from_center_diameter_km_format():
 def test_bbox_from_center_diameter_km_invalid():
     with pytest.raises(ValueError):
         bbox_from_center_diameter_km(37.0, 55.0, 0)
+
+
+def test_json_dumps_safe_roundtrip():
+    s = json_dumps_safe({"name": "Кафе", 1: [1, 2]})
+    assert "Кафе" in s  # без \\u-экранирования
+    assert json_loads(s) == {"name": "Кафе", "1": [1, 2]}
+    assert json_dumps_safe({"x": object()}) == "{}"
+
+
+def test_digits_only():
+    assert digits_only("(5 725)") == "5725"
+    assert digits_only("+7 (495)–123-45-67") == "74951234567"
+    assert digits_only("") == ""
+    assert digits_only(None) == ""
+
+
+def test_rate_limiter_spaces_calls(monkeypatch):
+    import ymaps_excel_export.utils as utils
+
+    clock = [100.0]
+    sleeps = []
+    monkeypatch.setattr(utils.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(utils.time, "sleep", sleeps.append)
+
+    limiter = RateLimiter(0.5)
+    limiter.acquire()          # первый — сразу
+    limiter.acquire()          # второй — ждёт интервал
+    clock[0] += 5.0
+    limiter.acquire()          # после паузы длиннее интервала — снова сразу
+
+    assert sleeps == [0.5]
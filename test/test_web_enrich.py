@@ -2,76 +2,68 @@ import pytest
 
 from ymaps_excel_export.models import Company
 from ymaps_excel_export.web_enrich import (
-    parse_rating_reviews_from_jsonld,
+    parse_rating_counts_from_jsonld,
     parse_web_contacts_fast,
     requests_is_blocked,
     enrich_company_from_web,
+    walk_find_first,
+    walk_find_many,
+    _raw_json_append_key,
 )
 
 
-def test_parse_rating_reviews_from_jsonld():
-    html = """
-    <html><head>
-      <script type="application/ld+json">
-      {
-        "@context": "https://schema.org",
-        "@type": "LocalBusiness",
-        "aggregateRating": {"ratingValue":"4.9","reviewCount":"12"}
-      }
-      </script>
-    </head><body></body></html>
-    """
-    rating, count = parse_rating_reviews_from_jsonld(html)
+def test_parse_rating_counts_from_jsonld(html_jsonld_rating):
+    rating, rating_count, review_count = parse_rating_counts_from_jsonld(html_jsonld_rating)
     assert rating == "4,9"
-    assert count == "12"
-
-
-def test_parse_web_contacts_fast_tel_mailto_url():
-    html = """
-    <html><head>
-      <meta name="description" content="Звоните +7 (999) 111-22-33">
-    </head>
-    <body>
-      <a href="tel:+79992223344">Call</a>
-      <a href="mailto:test@example.com">Mail</a>
-      <a itemprop="url" href="https://site.example">Site</a>
-      <span itemprop="telephone">8 (999) 000-00-00</span>
-    </body></html>
-    """
-    d = parse_web_contacts_fast(html)
+    assert rating_count == ""
+    assert review_count == "12"
+
+
+def test_parse_web_contacts_fast_tel_mailto_url(html_contacts_fast):
+    d = parse_web_contacts_fast(html_contacts_fast)
     assert "test@example.com" in d["emails"]
     assert d["site"] == "https://site.example"
     # нормализация к +7...
     assert any(x.startswith("+7") for x in d["telephones"])
 
 
+def test_walk_find_many_keeps_depth_first_order():
+    obj = {"a": {"rating": 1, "x": [{"ratingCount": 5}]}, "rating": 2, "ratingCount": "7"}
+    found = walk_find_many(obj, {"rating", "ratingCount"})
+    assert found == {"rating": [1, 2], "ratingCount": [5, "7"]}
+
+
+def test_walk_find_first_stops_at_first_match():
+    obj = {"a": [{"rating": 1}, {"rating": 3}], "rating": 2}
+    assert walk_find_first(obj, "rating") == 1
+    assert walk_find_first(obj, "missing", "") == ""
+
+
+def test_raw_json_append_key_matches_full_redump():
+    from ymaps_excel_export.utils import json_loads
+
+    trace = {"ok": True, "rating": "4,9"}
+    assert json_loads(_raw_json_append_key("{}", "web_enrich", trace)) == {"web_enrich": trace}
+    out = _raw_json_append_key('{"id": "1", "name": "Кафе"}', "web_enrich", trace)
+    assert json_loads(out) == {"id": "1", "name": "Кафе", "web_enrich": trace}
+    # ключ уже есть / не объект -> полный разбор
+    assert _raw_json_append_key('{"web_enrich": {}}', "web_enrich", trace) is None
+    assert _raw_json_append_key("[1]", "web_enrich", trace) is None
+
+
 def test_requests_is_blocked_by_url():
     assert requests_is_blocked("https://yandex.ru/showcaptcha?x=1", "<html></html>") is True
 
 
-def test_enrich_company_from_web_without_selenium(st_base, monkeypatch):
+def test_enrich_company_from_web_without_selenium(st_base, monkeypatch, html_enrich_example):
     # Подготовка Company
     c = Company(ID="123", raw_json="{}")
 
-    # HTML без капчи
-    html = """
-    <html><head>
-      <script type="application/ld+json">
-      {"aggregateRating":{"ratingValue":"5","reviewCount":"1"}}
-      </script>
-    </head>
-    <body>
-      <a href="tel:+79990000000">Call</a>
-      <a href="mailto:x@y.ru">Mail</a>
-      <a itemprop="url" href="https://example.com">Site</a>
-    </body></html>
-    """
-
     # Подменяем http_get_org_page внутри модуля
     import ymaps_excel_export.web_enrich as we
 
     def fake_get(session, oid, timeout_sec):
-        return ("https://yandex.ru/maps/org/123/", html)
+        return ("https://yandex.ru/maps/org/123/", html_enrich_example)
 
     monkeypatch.setattr(we, "http_get_org_page", fake_get)
 
@@ -91,3 +83,137 @@ def test_enrich_company_from_web_without_selenium(st_base, monkeypatch):
     assert c2.Рейтинг in ("5,0", "5,0".replace(".", ","))  # на всякий
     assert c2.Количество_отзывов == "1"
     assert stats["used_selenium"] is False
+
+
+def test_enrich_company_from_web_respects_small_max_phones(st_base, html_enrich_example):
+    from dataclasses import replace
+
+    st = replace(st_base, MAX_PHONES=1, MAX_EMAILS=0)
+    c, stats = enrich_company_from_web(st, Company(ID="123", raw_json="{}"), None, None,
+                                       page=("https://yandex.ru/maps/org/123/", html_enrich_example))
+
+    assert stats["ok"] is True
+    assert c.Телефон_1.startswith("+7") and c.Телефон_2 == ""
+    assert c.Email_1 == ""
+
+
+def test_enrich_companies_web_parallel_keeps_order(st_base, monkeypatch, html_enrich_example):
+    import ymaps_excel_export.web_enrich as we
+
+    def fake_get(session, oid, timeout_sec):
+        assert session is not None  # одна keep-alive сессия на поток
+        if oid == "2":
+            raise RuntimeError("boom")
+        return (f"https://yandex.ru/maps/org/{oid}/", html_enrich_example)
+
+    monkeypatch.setattr(we, "http_get_org_page", fake_get)
+
+    class DummyPool:
+        def get_page_html(self, url: str) -> str:
+            raise AssertionError("Selenium не должен вызываться без капчи")
+
+    from dataclasses import replace
+
+    companies = [Company(ID=oid, raw_json="{}") for oid in ("1", "2", "abc", "", "4")]
+    st = replace(st_base, WEB_WORKERS=3, SLEEP_SEC=0.0)
+
+    stats = we.enrich_companies_web(st, companies, DummyPool())
+
+    # "abc" (нецифровой ID) enrich пропускает — это skipped, не success
+    assert (stats["attempted"], stats["success"], stats["failed"], stats["skipped"]) == (4, 2, 1, 2)
+    assert stats["errors"] == ["2: boom"]
+    assert [c.Email_1 for c in companies] == ["x@y.ru", "", "", "", "x@y.ru"]
+
+
+def test_enrich_companies_web_parse_processes_same_result(st_base, monkeypatch, html_enrich_example):
+    import ymaps_excel_export.web_enrich as we
+    from dataclasses import replace
+
+    monkeypatch.setattr(we, "http_get_org_page", lambda session, oid, timeout_sec: (f"https://yandex.ru/maps/org/{oid}/", html_enrich_example))
+    monkeypatch.setattr(we, "available_cpus", lambda: 2)
+
+    class DummyPool:
+        def get_page_html(self, url: str) -> str:
+            raise AssertionError("Selenium не должен вызываться без капчи")
+
+    oids = ("1", "2", "3", "4", "5")
+    seq = [Company(ID=oid, raw_json="{}") for oid in oids]
+    par = [Company(ID=oid, raw_json="{}") for oid in oids]
+    we.enrich_companies_web(replace(st_base, SLEEP_SEC=0.0), seq, DummyPool())
+    stats = we.enrich_companies_web(replace(st_base, SLEEP_SEC=0.0, WEB_PARSE_PROCESSES=2), par, DummyPool())
+
+    assert stats["success"] == len(oids)
+    assert [c.as_excel_values() for c in par] == [c.as_excel_values() for c in seq]
+
+
+def test_enrich_company_from_web_blocked_skips_selenium_when_filled(st_base):
+    from dataclasses import replace
+
+    # заполнены рейтинг/сайт/режим и Телефон_1/Email_1; Телефон_2/3, Email_2/3 и счётчики пусты,
+    # но при MAX_PHONES=MAX_EMAILS=1 их WEB-enrich и не заполнит
+    c = Company(
+        ID="123", Рейтинг="4,5", Сайт="https://a.ru", Режим_работы="24/7",
+        Телефон_1="+74950000000", Email_1="a@a.ru", raw_json="{}",
+    )
+
+    class DummyPool:
+        def get_page_html(self, url: str) -> str:
+            raise AssertionError("Selenium не нужен: нужные поля уже заполнены")
+
+    st = replace(st_base, WEB_FORCE_OVERWRITE=False, MAX_PHONES=1, MAX_EMAILS=1)
+    page = ("https://yandex.ru/showcaptcha?x=1", "<html></html>")
+    c2, stats = enrich_company_from_web(st, c, DummyPool(), None, page=page)
+
+    assert stats["skipped"] == "blocked_needed_filled"
+    assert c2.Сайт == "https://a.ru"
+
+
+def test_enrich_company_from_web_blocked_uses_selenium_for_missing_contacts(st_base, html_enrich_example):
+    from dataclasses import replace
+
+    # рейтинг/сайт/режим есть, но телефонов и email нет — Selenium нужен
+    c = Company(ID="123", Рейтинг="4,5", Сайт="https://a.ru", Режим_работы="24/7", raw_json="{}")
+
+    class DummyPool:
+        urls = []
+
+        def get_page_html(self, url: str) -> str:
+            self.urls.append(url)
+            return html_enrich_example
+
+    pool = DummyPool()
+    st = replace(st_base, WEB_FORCE_OVERWRITE=False)
+    page = ("https://yandex.ru/showcaptcha?x=1", "<html></html>")
+    c2, stats = enrich_company_from_web(st, c, pool, None, page=page)
+
+    assert pool.urls == ["https://yandex.ru/maps/org/123"]
+    assert stats["used_selenium"] is True
+    assert c2.Сайт == "https://a.ru"
+    assert c2.Email_1 == "x@y.ru"
+
+
+def test_fetch_org_pages_bounds_pages_in_flight(st_base, monkeypatch):
+    import threading
+    from dataclasses import replace
+
+    import ymaps_excel_export.web_enrich as we
+
+    started = []
+    lock = threading.Lock()
+
+    def fake_get(session, oid, timeout_sec):
+        with lock:
+            started.append(oid)
+        return (f"https://yandex.ru/maps/org/{oid}/", "<html></html>")
+
+    monkeypatch.setattr(we, "http_get_org_page", fake_get)
+
+    oids = [str(i) for i in range(1, 21)]
+    st = replace(st_base, WEB_WORKERS=2, SLEEP_SEC=0.0)
+    got = []
+    for page, err in we._fetch_org_pages(st, oids):
+        # потребитель «медленный» (Selenium): вперёд ушло не больше 2*WEB_WORKERS загрузок
+        assert len(started) <= len(got) + 2 * 2
+        got.append(page[0])
+
+    assert got == [f"https://yandex.ru/maps/org/{oid}/" for oid in oids]
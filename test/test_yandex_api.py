@@ -1,5 +1,6 @@
 import json
 import time
+from dataclasses import replace
 
 import pytest
 
@@ -31,7 +32,7 @@ def test_company_from_feature_rating_is_1_decimal_comma(st_base):
 
 
 def test_search_bbox_invalid_apikey_returns_human_error(st_base, requests_mock):
-    st = st_base.__class__(**{**st_base.__dict__, "YMAPIKEY": "BAD_KEY"})  # frozen dataclass workaround
+    st = replace(st_base, YMAPIKEY="BAD_KEY")
 
     requests_mock.get(
         YMAPS_SEARCH_URL,
@@ -47,7 +48,7 @@ def test_search_bbox_invalid_apikey_returns_human_error(st_base, requests_mock):
 
 
 def test_search_bbox_429_then_success(st_base, requests_mock, monkeypatch):
-    st = st_base.__class__(**{**st_base.__dict__, "YMAPIKEY": "OK_KEY"})
+    st = replace(st_base, YMAPIKEY="OK_KEY")
 
     # чтобы тест не ждал backoff
     monkeypatch.setattr(time, "sleep", lambda *_: None)
@@ -64,3 +65,65 @@ def test_search_bbox_429_then_success(st_base, requests_mock, monkeypatch):
     assert err == ""
     assert companies == []
     assert meta["total"] == 0
+
+
+def test_search_bbox_returns_session_for_reuse(st_base, requests_mock):
+    import ymaps_excel_export.yandex_api as ya
+
+    st = replace(st_base, YMAPIKEY="OK_KEY", SLEEP_SEC=0.0, API_PAGE_WORKERS=1)
+    requests_mock.get(YMAPS_SEARCH_URL, json={"features": []})
+
+    ya._IDLE_SESSIONS.clear()
+    search_bbox(st, bbox="37.0,55.0~38.0,56.0")
+    assert len(ya._IDLE_SESSIONS) == 1
+
+    # следующий вызов (например, uri-requery) получает ту же сессию с открытым соединением
+    s = ya._IDLE_SESSIONS[0]
+    assert ya.acquire_api_session() is s
+    ya.release_api_session(s)
+
+
+def _feature(oid: str) -> dict:
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [37.0, 55.0]},
+        "properties": {"CompanyMetaData": {"id": oid, "name": f"Org {oid}"}, "name": f"Org {oid}"},
+    }
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_search_bbox_pages_keep_order_and_dedup(st_base, requests_mock, workers):
+    # страницы по 2: skip=0 -> 1,2; skip=2 -> 2,3 (дубль); skip=4 -> 4 (неполная, конец)
+    pages = {0: ["1", "2"], 2: ["2", "3"], 4: ["4"]}
+
+    def answer(request, context):
+        skip = int(request.qs["skip"][0])
+        return {"features": [_feature(oid) for oid in pages.get(skip, [])]}
+
+    requests_mock.get(YMAPS_SEARCH_URL, json=answer)
+    st = replace(st_base, YMAPIKEY="OK_KEY", SLEEP_SEC=0.0, RESULTS_PER_PAGE=2, MAX_SKIP=0, API_PAGE_WORKERS=workers)
+
+    companies, meta, err = search_bbox(st, bbox="37.0,55.0~38.0,56.0")
+
+    assert err == ""
+    assert [c.ID for c in companies] == ["1", "2", "3", "4"]
+    assert meta["unique"] == 4
+
+
+def test_search_bbox_429_honors_retry_after(st_base, requests_mock, monkeypatch):
+    st = replace(st_base, YMAPIKEY="OK_KEY", SLEEP_SEC=0.0)
+
+    slept = []
+    monkeypatch.setattr(time, "sleep", lambda sec: slept.append(sec))
+
+    requests_mock.get(
+        YMAPS_SEARCH_URL,
+        [
+            {"status_code": 429, "text": "Too Many Requests", "headers": {"Retry-After": "7"}},
+            {"status_code": 200, "json": {"features": []}},
+        ],
+    )
+
+    _companies, _meta, err = search_bbox(st, bbox="37.0,55.0~38.0,56.0")
+    assert err == ""
+    assert slept == [7.0]
@@ -13,41 +13,80 @@ file:/C:/Users/user/PycharmProjects/ParserYandexMap_main/ymaps_excel_export/conf
 Все остальные параметры меняются:
 - либо прямо в этом файле (дефолты),
 - либо через переменные окружения (но не через .env).
+
+Единственная точка чтения .env / окружения — Settings.from_env().
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import functools
+import os
+import re
+import stat
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import List
-
-from dotenv import load_dotenv
+from types import MappingProxyType
+from typing import Any, Callable, Collection, Dict, Final, List, Mapping, Set, Tuple
 
+from .models import EXCEL_HEADERS
 from .utils import env_bool01, env_float, env_int, env_str
 
-# project root = папка на уровень выше пакета ymaps_excel_export
-PROJECT_ROOT = Path(__file__).resolve().parent.parent
-ENV_PATH = PROJECT_ROOT / ".env"
+
+@functools.cache
+def _project_root() -> Path:
+    """
+    project root = папка на уровень выше пакета ymaps_excel_export
+    (resolve() делаем один раз и только когда путь реально нужен).
+    """
+    return Path(__file__).resolve().parent.parent
+
+
+def _env_path() -> Path:
+    return _project_root() / ".env"
+
+
+# Ключ строки .env: всё до первого "=", строки-комментарии (#...) не совпадают.
+_ENV_KEY_RE = re.compile(rb"(?m)^[ \t]*([^#\s=][^\r\n=]*?)[ \t]*=")
+
+# Имя поля Settings == имя переменной окружения; парсер выбирается по аннотации поля.
+_ENV_PARSERS: Final[Dict[str, Callable[..., Any]]] = {
+    "str": env_str,
+    "int": env_int,
+    "float": env_float,
+    "bool": env_bool01,
+}
+# YMAPIKEY читается отдельно (YM_API_KEY / YMAPIKEY), HEADERS не настраивается.
+_ENV_SKIP_FIELDS: Final = frozenset({"YMAPIKEY", "HEADERS"})
+
+# Единственные ключи, допустимые в .env
+_ALLOWED_ENV_KEYS: Final = frozenset(("YM_API_KEY", "YMAPIKEY"))
+
+# (path, mtime_ns, size) уже проверенных .env
+_ENV_VALIDATED: Set[Tuple[str, int, int]] = set()
 
 
 def _validate_env_only_api_key(env_path: Path) -> None:
     """
     Жёстко запрещаем хранить любые параметры кроме API key в .env.
     """
-    if not env_path.exists() or not env_path.is_file():
+    try:
+        fst = env_path.stat()
+    except OSError:
+        return
+    if not stat.S_ISREG(fst.st_mode):
         return
 
-    allowed = {"YM_API_KEY", "YMAPIKEY"}
-    bad: List[str] = []
+    # Файл не менялся с прошлой успешной проверки — повторно не разбираем.
+    cache_key = (str(env_path), fst.st_mtime_ns, fst.st_size)
+    if cache_key in _ENV_VALIDATED:
+        return
 
-    text = env_path.read_text(encoding="utf-8", errors="ignore")
-    for raw in text.splitlines():
-        line = raw.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
+    bad: List[str] = []
 
-        k = line.split("=", 1)[0].strip()
-        if k and k not in allowed:
+    data = env_path.read_bytes()
+    for m in _ENV_KEY_RE.finditer(data):
+        k = m.group(1).decode("utf-8", errors="ignore").strip()
+        if k and k not in _ALLOWED_ENV_KEYS:
             bad.append(k)
 
     if bad:
@@ -58,22 +97,14 @@ def _validate_env_only_api_key(env_path: Path) -> None:
             f"Найдены лишние ключи: {bad_keys}"
         )
 
+    # Кэшируем только успешную проверку: ошибка должна повторяться при каждом вызове.
+    _ENV_VALIDATED.add(cache_key)
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Settings:
     """
-    Главная конфигурация.
-
-    MODE:
-    - ONLINEAPI : поиск организаций через Yandex Search Maps API (bbox)
-    - OFFLINEHTML : парсинг сохранённых html-файлов выдачи
-    - SELENIUM : живой режим — пользователь открывает Я.Карты в Chrome и жмёт Enter
-
-    OFFLINE_ENRICH_MODE:
-    - NONE : не дозаполнять
-    - API : дозаполнение через uri-requery (нужен YMAPIKEY)
-    - WEB : дозаполнение через web-карточку (requests -> selenium fallback)
-    - APIWEB: сначала API, потом WEB
+    Главная конфигурация (описание MODE / OFFLINE_ENRICH_MODE — README, «Режимы работы»).
     """
 
     # ---------------------------
@@ -104,6 +135,10 @@ class Settings:
     # Паузы / лимиты
     # ---------------------------
     SLEEP_SEC: float = 0.5
+    URI_REQUERY_WORKERS: int = 4  # параллельных HTTP-запросов uri-requery (1 = последовательно)
+    # параллельных запросов страниц выдачи search_bbox (1 = последовательно). >1 запрашивает страницы
+    # наперёд: за последней страницей bbox уходит до API_PAGE_WORKERS-1 лишних запросов (расход квоты API)
+    API_PAGE_WORKERS: int = 1
 
     # ---------------------------
     # Enrich поведение
@@ -131,6 +166,8 @@ class Settings:
     WEB_FORCE_OVERWRITE: bool = True
     WEB_MAX_ITEMS: int = 0
     WEB_TIMEOUT_SEC: int = 12
+    WEB_WORKERS: int = 4  # параллельных HTTP-загрузок страниц WEB-enrich (1 = последовательно)
+    WEB_PARSE_PROCESSES: int = 1  # процессов для разбора страниц WEB-enrich (1 = в основном процессе)
 
     # ---------------------------
     # Selenium (fallback и SELENIUM-режим)
@@ -138,12 +175,14 @@ class Settings:
     CHROME_EXE: str = r"C:\Program Files\Google\Chrome\Application\chrome.exe"
     DEBUG_HOST: str = "127.0.0.1"
     DEBUG_PORT: int = 9222
-    CHROME_PROFILE_DIR: str = str((PROJECT_ROOT / "ChromeProfile9222").resolve())
+    CHROME_PROFILE_DIR: str = ""  # пусто -> <project root>/ChromeProfile9222 (см. __post_init__)
     CHROME_START_TIMEOUT_SEC: int = 15
 
     SELENIUM_HEADLESS: bool = False
     SELENIUM_PAGE_WAIT_SEC: float = 1.0
     SELENIUM_WAIT_CONTACTS_SEC: int = 12
+    SELENIUM_CHALLENGE_TIMEOUT_SEC: int = 600
+    SELENIUM_DISABLE_IMAGES: bool = False
     CLOSE_EXISTING_DEBUG_CHROME: bool = False
 
     # ---------------------------
@@ -169,130 +208,82 @@ class Settings:
     # ---------------------------
     # Excel headers
     # ---------------------------
-    HEADERS: List[str] = None  # type: ignore[assignment]
+    HEADERS: Tuple[str, ...] = EXCEL_HEADERS  # один неизменяемый кортеж на все экземпляры
 
     def __post_init__(self) -> None:
-        object.__setattr__(
-            self,
-            "HEADERS",
-            [
-                "ID",
-                "Название",
-                "Адрес",
-                "Индекс",
-                "Долгота",
-                "Широта",
-                "Сайт",
-                "Телефон 1",
-                "Телефон 2",
-                "Телефон 3",
-                "Email 1",
-                "Email 2",
-                "Email 3",
-                "Режим работы",
-                "Рейтинг",
-                "Количество оценок",  # между Рейтинг и Количество отзывов
-                "Количество отзывов",
-                "Категория 1",
-                "Категория 2",
-                "Категория 3",
-                "Особенности",
-                "uri",
-                "Факс 1",
-                # "Факс 2",  # УДАЛЕНО из Excel
-                # "Факс 3",  # УДАЛЕНО из Excel
-                "Категории (прочие)",
-                "raw_json",
-            ],
-        )
+        if not self.CHROME_PROFILE_DIR:
+            object.__setattr__(
+                self, "CHROME_PROFILE_DIR", str((_project_root() / "ChromeProfile9222").resolve())
+            )
 
     @classmethod
-    def from_env(cls) -> "Settings":
+    def from_env(cls, **overrides: Any) -> "Settings":
         """
         Загружает .env (ТОЛЬКО ключ API) и читает переменные окружения.
+
+        Результат без overrides кэшируется на процесс (Settings неизменяем,
+        делить его безопасно). Перечитать окружение — Settings.reload().
+
+        overrides: значения полей, которые берутся как есть, без чтения окружения
+        (результат с overrides не кэшируется).
         """
-        _validate_env_only_api_key(ENV_PATH)
+        if not overrides:
+            return _build_settings()
+        return cls(**_read_env_kwargs(skip=overrides.keys()), **overrides)
 
-        # .env может содержать только ключ, но load_dotenv пусть загрузит его в окружение
-        load_dotenv(dotenv_path=ENV_PATH, override=True)
+    @classmethod
+    def reload(cls) -> "Settings":
+        """
+        Сбрасывает кэш from_env и заново читает .env / окружение.
+        """
+        _build_settings.cache_clear()
+        return _build_settings()
 
-        # Приоритет: YM_API_KEY, затем YMAPIKEY (для совместимости)
-        api_key = env_str("YM_API_KEY", env_str("YMAPIKEY", ""))
-
-        return cls(
-            MODE=env_str("MODE", cls.MODE),
-            OFFLINE_HTML_INPUT=env_str("OFFLINE_HTML_INPUT", cls.OFFLINE_HTML_INPUT),
-            OFFLINE_ENRICH_MODE=env_str("OFFLINE_ENRICH_MODE", cls.OFFLINE_ENRICH_MODE),
-            YMAPIKEY=api_key,
-            TEXT=env_str("TEXT", cls.TEXT),
-            LANG=env_str("LANG", cls.LANG),
-            CENTER_LON=env_float("CENTER_LON", cls.CENTER_LON),
-            CENTER_LAT=env_float("CENTER_LAT", cls.CENTER_LAT),
-            DIAMETER_KM=env_float("DIAMETER_KM", cls.DIAMETER_KM),
-            RESULTS_PER_PAGE=env_int("RESULTS_PER_PAGE", cls.RESULTS_PER_PAGE),
-            MAX_SKIP=env_int("MAX_SKIP", cls.MAX_SKIP),
-            STRICT_BBOX=env_bool01("STRICT_BBOX", cls.STRICT_BBOX),
-            SLEEP_SEC=env_float("SLEEP_SEC", cls.SLEEP_SEC),
-            ENABLE_URI_REQUERY=env_bool01("ENABLE_URI_REQUERY", cls.ENABLE_URI_REQUERY),
-            ENABLE_WEB_FALLBACK_FOR_RATING=env_bool01(
-                "ENABLE_WEB_FALLBACK_FOR_RATING", cls.ENABLE_WEB_FALLBACK_FOR_RATING
-            ),
-            MAX_PHONES=env_int("MAX_PHONES", cls.MAX_PHONES),
-            MAX_EMAILS=env_int("MAX_EMAILS", cls.MAX_EMAILS),
-            MAX_FAXES=env_int("MAX_FAXES", cls.MAX_FAXES),
-            MAX_CATEGORIES_MAIN=env_int("MAX_CATEGORIES_MAIN", cls.MAX_CATEGORIES_MAIN),
-            OUT_DIR=env_str("OUT_DIR", cls.OUT_DIR),
-            OUT_PREFIX=env_str("OUT_PREFIX", cls.OUT_PREFIX),
-            WEB_FORCE_OVERWRITE=env_bool01("WEB_FORCE_OVERWRITE", cls.WEB_FORCE_OVERWRITE),
-            WEB_MAX_ITEMS=env_int("WEB_MAX_ITEMS", cls.WEB_MAX_ITEMS),
-            WEB_TIMEOUT_SEC=env_int("WEB_TIMEOUT_SEC", cls.WEB_TIMEOUT_SEC),
-            CHROME_EXE=env_str("CHROME_EXE", cls.CHROME_EXE),
-            DEBUG_HOST=env_str("DEBUG_HOST", cls.DEBUG_HOST),
-            DEBUG_PORT=env_int("DEBUG_PORT", cls.DEBUG_PORT),
-            CHROME_PROFILE_DIR=env_str("CHROME_PROFILE_DIR", cls.CHROME_PROFILE_DIR),
-            CHROME_START_TIMEOUT_SEC=env_int(
-                "CHROME_START_TIMEOUT_SEC", cls.CHROME_START_TIMEOUT_SEC
-            ),
-            SELENIUM_HEADLESS=env_bool01("SELENIUM_HEADLESS", cls.SELENIUM_HEADLESS),
-            SELENIUM_PAGE_WAIT_SEC=env_float(
-                "SELENIUM_PAGE_WAIT_SEC", cls.SELENIUM_PAGE_WAIT_SEC
-            ),
-            SELENIUM_WAIT_CONTACTS_SEC=env_int(
-                "SELENIUM_WAIT_CONTACTS_SEC", cls.SELENIUM_WAIT_CONTACTS_SEC
-            ),
-            CLOSE_EXISTING_DEBUG_CHROME=env_bool01(
-                "CLOSE_EXISTING_DEBUG_CHROME", cls.CLOSE_EXISTING_DEBUG_CHROME
-            ),
-            SELENIUM_START_URL=env_str("SELENIUM_START_URL", cls.SELENIUM_START_URL),
-            SELENIUM_WAIT_FOR_ENTER=env_bool01(
-                "SELENIUM_WAIT_FOR_ENTER", cls.SELENIUM_WAIT_FOR_ENTER
-            ),
-            SELENIUM_SCROLL_TO_END=env_bool01(
-                "SELENIUM_SCROLL_TO_END", cls.SELENIUM_SCROLL_TO_END
-            ),
-            SELENIUM_SCROLL_MAX_SEC=env_float(
-                "SELENIUM_SCROLL_MAX_SEC", cls.SELENIUM_SCROLL_MAX_SEC
-            ),
-            SELENIUM_SCROLL_STEP_SEC=env_float(
-                "SELENIUM_SCROLL_STEP_SEC", cls.SELENIUM_SCROLL_STEP_SEC
-            ),
-            SELENIUM_SCROLL_STABLE_ROUNDS=env_int(
-                "SELENIUM_SCROLL_STABLE_ROUNDS", cls.SELENIUM_SCROLL_STABLE_ROUNDS
-            ),
-            SELENIUM_LIST_ITEM_CSS=env_str(
-                "SELENIUM_LIST_ITEM_CSS", cls.SELENIUM_LIST_ITEM_CSS
-            ),
-            SELENIUM_END_MARKER_CSS=env_str(
-                "SELENIUM_END_MARKER_CSS", cls.SELENIUM_END_MARKER_CSS
-            ),
-            SELENIUM_OPEN_URL_IN_NEW_TAB=env_bool01(
-                "SELENIUM_OPEN_URL_IN_NEW_TAB", cls.SELENIUM_OPEN_URL_IN_NEW_TAB
-            ),
-            SELENIUM_RETURN_TO_ORIGINAL_TAB=env_bool01(
-                "SELENIUM_RETURN_TO_ORIGINAL_TAB", cls.SELENIUM_RETURN_TO_ORIGINAL_TAB
-            ),
-            SELENIUM_KEEP_CHROME_OPEN=env_bool01(
-                "SELENIUM_KEEP_CHROME_OPEN", cls.SELENIUM_KEEP_CHROME_OPEN
-            ),
-            VERBOSE=env_bool01("VERBOSE", cls.VERBOSE),
+
+# имя переменной окружения -> (парсер, дефолт); считается один раз при импорте
+_ENV_FIELDS: Final[Mapping[str, Tuple[Callable[..., Any], Any]]] = MappingProxyType(
+    {
+        f.name: (
+            _ENV_PARSERS.get(f.type if isinstance(f.type, str) else f.type.__name__, env_str),
+            f.default,
         )
+        for f in fields(Settings)
+        if f.name not in _ENV_SKIP_FIELDS
+    }
+)
+
+
+def _read_env_kwargs(skip: Collection[str] = ()) -> Dict[str, Any]:
+    """
+    Читает .env + окружение в kwargs для Settings (поля из skip не читаются).
+    """
+    env_path = _env_path()
+    _validate_env_only_api_key(env_path)
+
+    # dotenv импортируется лениво: import config без from_env его не тянет
+    from dotenv import load_dotenv
+
+    # .env может содержать только ключ, но load_dotenv пусть загрузит его в окружение
+    load_dotenv(dotenv_path=env_path, override=True)
+
+    # Один снимок окружения на все параметры (вместо ~40 обращений к os.environ)
+    env = dict(os.environ)
+
+    kwargs: Dict[str, Any] = {}
+    if "YMAPIKEY" not in skip:
+        # Приоритет: YM_API_KEY, затем YMAPIKEY (для совместимости)
+        kwargs["YMAPIKEY"] = env_str("YM_API_KEY", env_str("YMAPIKEY", "", env), env)
+
+    for name, (parser, default) in _ENV_FIELDS.items():
+        if name not in skip:
+            kwargs[name] = parser(name, default, env)
+
+    return kwargs
+
+
+@functools.lru_cache(maxsize=1)
+def _build_settings() -> Settings:
+    """
+    Кэшируемый результат Settings.from_env() без overrides.
+    """
+    return Settings(**_read_env_kwargs())
@@ -2,19 +2,22 @@
 
 from __future__ import annotations
 
-import json
+import functools
 import math
 import re
-from typing import Any, Dict, List, Optional
-
-import openpyxl
-from openpyxl.styles import Alignment, Font, PatternFill
-from openpyxl.utils import get_column_letter
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from .config import Settings
-from .models import Company
+from .models import EXCEL_FIELD_BY_HEADER, EXCEL_HEADERS, Company
+from .utils import json_dumps_safe
+
+# Целое, допускаются пробелы/NBSP между разрядами ("12 345")
+_INT_RE = re.compile(r"\s*\d[\d \u00A0]*\s*")
 
-_INT_RE = re.compile(r"^\s*\d+\s*$")
+# Один проход translate вместо цепочки .replace(): пробелы/NBSP удаляем, запятую -> точка
+_STRIP_SPACES_TABLE = str.maketrans("", "", " \u00A0")
+_FLOAT_RU_TABLE = str.maketrans({" ": None, "\u00A0": None, ",": "."})
 
 
 def _to_int_maybe(x: Any) -> Optional[int]:
@@ -23,17 +26,14 @@ def _to_int_maybe(x: Any) -> Optional[int]:
     if isinstance(x, int):
         return x
 
-    s = str(x).strip()
-    if not s:
+    s = x if isinstance(x, str) else str(x)
+    if not _INT_RE.fullmatch(s):
+        return None
+    try:
+        # int() сам отбрасывает пробельные символы по краям
+        return int(s.translate(_STRIP_SPACES_TABLE))
+    except Exception:
         return None
-
-    s2 = s.replace(" ", "").replace("\u00A0", "")
-    if _INT_RE.match(s2):
-        try:
-            return int(s2)
-        except Exception:
-            return None
-    return None
 
 
 def _to_float_ru_maybe(x: Any) -> Optional[float]:
@@ -48,20 +48,37 @@ def _to_float_ru_maybe(x: Any) -> Optional[float]:
     if not s:
         return None
 
-    s = s.replace("\u00A0", "").replace(" ", "").replace(",", ".")
+    s = s.translate(_FLOAT_RU_TABLE)
     try:
         return float(s)
     except Exception:
         return None
 
 
-def _find_col_idx(headers: List[str], name: str) -> Optional[int]:
+def _find_col_idx(headers: Sequence[str], name: str) -> Optional[int]:
     try:
         return headers.index(name) + 1  # 1-based
     except ValueError:
         return None
 
 
+@functools.lru_cache(maxsize=8)
+def _special_col_idx(headers: Tuple[str, ...]) -> Tuple[int, int, int, int, int]:
+    """
+    0-based индексы (raw_json, ID, Рейтинг, Количество оценок, Количество отзывов); -1 — колонки нет.
+    HEADERS от запуска к запуску не меняется — считаем один раз на набор колонок.
+    """
+    def idx(name: str) -> int:
+        i = _find_col_idx(headers, name)
+        return i - 1 if i is not None else -1
+
+    return idx("raw_json"), idx("ID"), idx("Рейтинг"), idx("Количество оценок"), idx("Количество отзывов")
+
+
+# стандартный набор колонок — сразу при импорте
+_special_col_idx(EXCEL_HEADERS)
+
+
 def _cell_lines_estimate(value: Any, col_width_chars: float) -> int:
     if value is None:
         return 1
@@ -80,155 +97,239 @@ def _cell_lines_estimate(value: Any, col_width_chars: float) -> int:
     return max(1, total)
 
 
-def write_request_sheet(ws, request_meta: Dict[str, Any]) -> None:
-    ws.title = "Запрос"
-    ws.append(["Параметр", "Значение"])
+def _named_style(wb, name: str, **kwargs: Any) -> str:
+    """
+    Регистрирует NamedStyle в книге (один раз) и возвращает его имя:
+    ячейке достаточно присвоить cell.style = name вместо font/alignment/format по отдельности.
+    """
+    if name not in wb.named_styles:
+        from openpyxl.styles import NamedStyle
 
-    header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-    header_font = Font(name="Calibri", size=11, bold=True, color="FFFFFF")
+        wb.add_named_style(NamedStyle(name=name, **kwargs))
+    return name
 
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-    body_font = Font(name="Calibri", size=11)
-    body_alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
 
+def _request_meta_rows(request_meta: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """
+    request_meta -> плоские пары (ключ, текст). Сложные значения сериализуются здесь,
+    а сам request_meta остаётся структурой (его же возвращает RunResult).
+    """
+    rows: List[Tuple[str, str]] = []
     for k, v in request_meta.items():
-        if isinstance(v, (dict, list)):
-            ws.append([k, json.dumps(v, ensure_ascii=False)])
+        if isinstance(v, str):
+            rows.append((k, v))
+        elif isinstance(v, (dict, list)):
+            rows.append((k, json_dumps_safe(v)))
         else:
-            ws.append([k, str(v)])
+            rows.append((k, str(v)))
+    return rows
 
-    for r in range(2, ws.max_row + 1):
-        for c in range(1, ws.max_column + 1):
-            cell = ws.cell(row=r, column=c)
-            cell.font = body_font
-            cell.alignment = body_alignment
 
+def write_request_sheet(ws, request_meta: Dict[str, Any]) -> None:
+    """
+    ws — лист write_only-книги: стили задаются ячейкам до записи строки.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    ws.title = "Запрос"
+    wb = ws.parent
+
+    header_style = _named_style(
+        wb,
+        "req_header",
+        fill=PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid"),
+        font=Font(name="Calibri", size=11, bold=True, color="FFFFFF"),
+        alignment=Alignment(horizontal="center", vertical="center", wrap_text=True),
+    )
+    body_style = _named_style(
+        wb,
+        "req_body",
+        font=Font(name="Calibri", size=11),
+        alignment=Alignment(horizontal="left", vertical="top", wrap_text=True),
+    )
+
+    # freeze_panes пишется в начало XML листа — задаём до первой строки
     ws.freeze_panes = "A2"
-    ws.auto_filter.ref = ws.dimensions
+
+    header: List[Any] = []
+    for v in ("Параметр", "Значение"):
+        cell = WriteOnlyCell(ws, value=v)
+        cell.style = header_style
+        header.append(cell)
+    ws.append(header)
+
+    meta_rows = _request_meta_rows(request_meta)
+    for k, text in meta_rows:
+        key_cell = WriteOnlyCell(ws, value=k)
+        key_cell.style = body_style
+        value_cell = WriteOnlyCell(ws, value=text)
+        value_cell.style = body_style
+        ws.append((key_cell, value_cell))
+
+    ws.auto_filter.ref = f"A1:B{len(meta_rows) + 1}"
 
 
 def write_companies_sheet(ws, st: Settings, companies: List[Company]) -> None:
+    """
+    ws — лист write_only-книги: строки стримятся в XML, поэтому всё (типы, ширины,
+    высоты, стили) считается до записи, а ячейки создаются сразу со стилями.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
     ws.title = "Организации"
-    ws.append(st.HEADERS)
+    wb = ws.parent
 
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(name="Calibri", size=11, bold=True, color="FFFFFF")
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    header_style = _named_style(
+        wb,
+        "org_header",
+        fill=PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid"),
+        font=Font(name="Calibri", size=11, bold=True, color="FFFFFF"),
+        alignment=Alignment(horizontal="center", vertical="center", wrap_text=True),
+    )
 
     body_font = Font(name="Calibri", size=11)
     align_wrap = Alignment(horizontal="left", vertical="top", wrap_text=True)
-    align_nowrap = Alignment(horizontal="left", vertical="top", wrap_text=False)
     align_center = Alignment(horizontal="center", vertical="center", wrap_text=False)
 
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-
-    rows = [c.as_excel_row() for c in companies]
-    for r in rows:
-        ws.append([r.get(h, "") for h in st.HEADERS])
-
-    idx_raw = _find_col_idx(st.HEADERS, "raw_json")
-    idx_id = _find_col_idx(st.HEADERS, "ID")
-    idx_rating = _find_col_idx(st.HEADERS, "Рейтинг")
-    idx_rating_count = _find_col_idx(st.HEADERS, "Количество оценок")   # <-- НОВОЕ
-    idx_reviews = _find_col_idx(st.HEADERS, "Количество отзывов")
-
-    # 1) Выравнивание + числовые форматы
-    for rr in range(2, ws.max_row + 1):
-        for cc in range(1, ws.max_column + 1):
-            cell = ws.cell(row=rr, column=cc)
-            cell.font = body_font
-            cell.alignment = align_nowrap if (idx_raw is not None and cc == idx_raw) else align_wrap
-
-        # ID — целое (без E+11)
-        if idx_id is not None:
-            c = ws.cell(row=rr, column=idx_id)
-            v = _to_int_maybe(c.value)
+    wrap_style = _named_style(wb, "org_wrap", font=body_font, alignment=align_wrap)
+    nowrap_style = _named_style(
+        wb,
+        "org_nowrap",
+        font=body_font,
+        alignment=Alignment(horizontal="left", vertical="top", wrap_text=False),
+    )
+    id_int_style = _named_style(wb, "org_id_int", font=body_font, alignment=align_wrap, number_format="0")
+    center_int_style = _named_style(
+        wb, "org_center_int", font=body_font, alignment=align_center, number_format="0"
+    )
+    center_float_style = _named_style(
+        wb, "org_center_float", font=body_font, alignment=align_center, number_format="0.0"
+    )
+
+    fields = [EXCEL_FIELD_BY_HEADER.get(h) for h in st.HEADERS]
+    if tuple(st.HEADERS) == EXCEL_HEADERS:
+        # стандартный набор колонок: значения уже в нужном порядке
+        rows: List[List[Any]] = [list(c.as_excel_values()) for c in companies]
+    elif len(fields) > 1 and all(fields):
+        # подмножество/перестановка известных колонок: один attrgetter (C) на строку
+        getter = attrgetter(*fields)
+        rows = [list(getter(c)) for c in companies]
+    else:
+        rows = []
+        for c in companies:
+            r = c.as_excel_row()
+            rows.append([r.get(h, "") for h in st.HEADERS])
+
+    raw_i, id_i, rating_i, rating_count_i, reviews_i = _special_col_idx(tuple(st.HEADERS))
+
+    # 1) Числовые колонки: ID / Количество оценок / Количество отзывов — целые,
+    #    Рейтинг — float. Ширины колонок считаем в том же проходе.
+    int_cols = [i for i in (id_i, rating_count_i, reviews_i) if i >= 0]
+    float_cols = [rating_i] if rating_i >= 0 else []
+
+    col_max = [max(10, len(h) + 2) for h in st.HEADERS]
+    for values in rows:
+        for i in int_cols:
+            v = _to_int_maybe(values[i])
             if v is not None:
-                c.value = v
-                c.number_format = "0"
-
-        # Рейтинг — по центру
-        if idx_rating is not None:
-            c = ws.cell(row=rr, column=idx_rating)
-            v = _to_float_ru_maybe(c.value)
-            if v is not None:
-                c.value = v
-                c.number_format = "0.0"
-                c.alignment = align_center
-
-        # Количество оценок — по центру
-        if idx_rating_count is not None:
-            c = ws.cell(row=rr, column=idx_rating_count)
-            v = _to_int_maybe(c.value)
-            if v is not None:
-                c.value = v
-                c.number_format = "0"
-                c.alignment = align_center
-
-        # Количество отзывов — по центру
-        if idx_reviews is not None:
-            c = ws.cell(row=rr, column=idx_reviews)
-            v = _to_int_maybe(c.value)
+                values[i] = v
+        for i in float_cols:
+            v = _to_float_ru_maybe(values[i])
             if v is not None:
-                c.value = v
-                c.number_format = "0"
-                c.alignment = align_center
-
-    # 2) Автоподбор ширины колонок
-    for colnum, header in enumerate(st.HEADERS, start=1):
-        colletter = get_column_letter(colnum)
-        maxlen = max(10, len(header) + 2)
-
-        for row in ws.iter_rows(min_row=1, min_col=colnum, max_col=colnum, max_row=ws.max_row):
-            cell = row[0]
-            if cell.value is None:
+                values[i] = v
+
+        for i, v in enumerate(values):
+            if v is None:
                 continue
-            s = str(cell.value)
-            maxlen = max(maxlen, min(len(s), 60))
+            n = min(len(v) if isinstance(v, str) else len(str(v)), 60)
+            if n > col_max[i]:
+                col_max[i] = n
 
-        ws.column_dimensions[colletter].width = min(max(maxlen, 10), 60)
+    # 2) Автоподбор ширины колонок (до записи строк)
+    widths = [min(maxlen, 60) for maxlen in col_max]
+    for colnum, w in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(colnum)].width = w
 
-    # 3) Высота строк (1 или 2 строки)
+    # 3) Высота строк (1 или 2 строки) — задаётся до записи строки
     ONE_LINE_PT = 15.0
     TWO_LINES_PT = 30.0
 
-    wrap_cols: List[int] = []
-    for colnum in range(1, len(st.HEADERS) + 1):
-        if idx_raw is not None and colnum == idx_raw:
-            continue
-        wrap_cols.append(colnum)
-
-    for rr in range(1, ws.max_row + 1):
-        need_two = False
-        for cc in wrap_cols:
-            colletter = get_column_letter(cc)
-            w = ws.column_dimensions[colletter].width
-            w = float(w) if w is not None else 10.0
-            v = ws.cell(row=rr, column=cc).value
-            if _cell_lines_estimate(v, w) >= 2:
-                need_two = True
-                break
-        ws.row_dimensions[rr].height = TWO_LINES_PT if need_two else ONE_LINE_PT
+    # (индекс 0-based, порог длины, ширина) для колонок с переносом — считаем один раз.
+    # Строка без переводов строк длиной >= cpl + 1 точно занимает 2+ строки, короче — одну.
+    wrap_cols: List[Tuple[int, int, float]] = [
+        (i, max(int(w), 1) + 1, float(w))
+        for i, w in enumerate(widths)
+        if i != raw_i
+    ]
+
+    def row_height(values) -> float:
+        for i, thresh, width in wrap_cols:
+            v = values[i]
+            if v is None:
+                continue
+            # числа (ID/рейтинг/счётчики уже приведены) — тоже через длину текста
+            t = v if isinstance(v, str) else str(v)
+            if t.isprintable():
+                # все разделители splitlines() непечатаемые — хватает сравнения длины
+                if len(t) >= thresh:
+                    return TWO_LINES_PT
+                continue
+            if _cell_lines_estimate(t, width) >= 2:
+                return TWO_LINES_PT
+        return ONE_LINE_PT
 
     ws.freeze_panes = "A2"
-    ws.auto_filter.ref = ws.dimensions
+
+    # 4) Запись: заголовок + строки (стили и форматы — на ячейках при создании)
+    ws.row_dimensions[1].height = row_height(st.HEADERS)
+    header: List[Any] = []
+    for h in st.HEADERS:
+        cell = WriteOnlyCell(ws, value=h)
+        cell.style = header_style
+        header.append(cell)
+    ws.append(header)
+
+    center_int = {rating_count_i, reviews_i}
+
+    for rr, values in enumerate(rows, start=2):
+        ws.row_dimensions[rr].height = row_height(values)
+
+        row: List[Any] = []
+        for i, v in enumerate(values):
+            cell = WriteOnlyCell(ws, value=v)
+
+            if isinstance(v, int) and i == id_i:
+                # ID — целое (без E+11)
+                cell.style = id_int_style
+            elif isinstance(v, float) and i == rating_i:
+                # Рейтинг — по центру
+                cell.style = center_float_style
+            elif isinstance(v, int) and i in center_int:
+                # Количество оценок / отзывов — по центру
+                cell.style = center_int_style
+            else:
+                cell.style = nowrap_style if i == raw_i else wrap_style
+
+            row.append(cell)
+        ws.append(row)
+
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(st.HEADERS))}{len(rows) + 1}"
 
 
 def save_to_excel(st: Settings, companies: List[Company], out_path: str, request_meta: Dict[str, Any]) -> None:
-    wb = openpyxl.Workbook()
+    # openpyxl импортируется только при сохранении (заметно ускоряет старт CLI)
+    import openpyxl
+
+    # write_only: строки стримятся в файл, Cell-объекты всего листа в памяти не держим
+    wb = openpyxl.Workbook(write_only=True)
 
-    ws_org = wb.active
+    ws_org = wb.create_sheet()
     write_companies_sheet(ws_org, st, companies)
 
     ws_req = wb.create_sheet()
     write_request_sheet(ws_req, request_meta)
 
-    wb.active = 0
     wb.save(out_path)
@@ -3,13 +3,52 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, List
-
-
-@dataclass
+from typing import Any, Dict, List, Tuple
+
+# Колонки листа "Организации" (порядок = порядок Company.as_excel_values()).
+EXCEL_HEADERS: Tuple[str, ...] = (
+    "ID",
+    "Название",
+    "Адрес",
+    "Индекс",
+    "Долгота",
+    "Широта",
+    "Сайт",
+    "Телефон 1",
+    "Телефон 2",
+    "Телефон 3",
+    "Email 1",
+    "Email 2",
+    "Email 3",
+    "Режим работы",
+    "Рейтинг",
+    "Количество оценок",  # между Рейтинг и Количество отзывов
+    "Количество отзывов",
+    "Категория 1",
+    "Категория 2",
+    "Категория 3",
+    "Особенности",
+    "uri",
+    "Факс 1",
+    # "Факс 2",  # УДАЛЕНО из Excel
+    # "Факс 3",  # УДАЛЕНО из Excel
+    "Категории (прочие)",
+    "raw_json",
+)
+
+# Заголовок Excel -> имя поля Company ("Телефон 1" -> "Телефон_1", "Категории (прочие)" -> "Категории_прочие")
+EXCEL_FIELD_BY_HEADER: Dict[str, str] = {
+    h: h.replace(" ", "_").replace("(", "").replace(")", "") for h in EXCEL_HEADERS
+}
+
+
+@dataclass(slots=True, kw_only=True)
 class Company:
     """
     Единая модель строки, которую пишем в Excel.
+
+    slots: экземпляров тысячи, __dict__ на каждый не нужен. Не frozen —
+    enrich-цепочки дозаполняют поля на месте.
     """
 
     ID: str = ""
@@ -50,6 +89,38 @@ class Company:
     Категории_прочие: str = ""
     raw_json: str = ""
 
+    def as_excel_values(self) -> Tuple[str, ...]:
+        """
+        Значения строки Excel в порядке EXCEL_HEADERS (без промежуточного dict).
+        """
+        return (
+            self.ID,
+            self.Название,
+            self.Адрес,
+            self.Индекс,
+            self.Долгота,
+            self.Широта,
+            self.Сайт,
+            self.Телефон_1,
+            self.Телефон_2,
+            self.Телефон_3,
+            self.Email_1,
+            self.Email_2,
+            self.Email_3,
+            self.Режим_работы,
+            self.Рейтинг,
+            self.Количество_оценок,
+            self.Количество_отзывов,
+            self.Категория_1,
+            self.Категория_2,
+            self.Категория_3,
+            self.Особенности,
+            self.uri,
+            self.Факс_1,
+            self.Категории_прочие,
+            self.raw_json,
+        )
+
     def as_excel_row(self) -> Dict[str, Any]:
         return {
             "ID": self.ID,
@@ -82,7 +153,7 @@ class Company:
         }
 
 
-@dataclass
+@dataclass(slots=True, kw_only=True)
 class RunResult:
     companies: List[Company] = field(default_factory=list)
     request_meta: Dict[str, Any] = field(default_factory=dict)
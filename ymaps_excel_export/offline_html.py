@@ -2,13 +2,14 @@
 
 from __future__ import annotations
 
+import functools
+from dataclasses import fields
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
-
-from bs4 import BeautifulSoup
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 from .models import Company
-from .utils import ANSI_RESET, ANSI_YELLOW, json_dumps_safe, log, safe_str
+from .utils import ANSI_RESET, ANSI_YELLOW, available_cpus, digits_only, json_dumps_safe, log, safe_str
 
 
 def iter_offline_html_files(input_path: str) -> List[Path]:
@@ -20,183 +21,430 @@ def iter_offline_html_files(input_path: str) -> List[Path]:
     return []
 
 
-def offline_html_is_scrolled_to_end(html: str) -> bool:
+def offline_html_is_scrolled_to_end(html: Union[str, bytes]) -> bool:
     """
     Грубая эвристика "страница пролистана до конца".
     """
+    if isinstance(html, bytes):
+        return b'class="add-business-view"' in html
     return 'class="add-business-view"' in (html or "")
 
 
+# Префикс для относительных ссылок карточек ("/maps/org/...")
+_YANDEX_ORIGIN = "https://yandex.ru"
+
+# Значение data-object карточки выдачи: {is_bytes: needle}
+_ITEM_MARKER = {False: "search-list-item", True: b"search-list-item"}
+
+
+def _decode_html(data: bytes) -> str:
+    # как read_text(encoding="utf-8", errors="ignore"): битые байты выкидываем, переводы строк -> "\n"
+    html = data.decode("utf-8", errors="ignore")
+    if "\r" in html:
+        html = html.replace("\r\n", "\n").replace("\r", "\n")
+    return html
+
+
 def _text(el) -> str:
     if not el:
         return ""
-    return safe_str(el.get_text(" ", strip=True))
+    # strip=True уже обрезал каждый кусок и выкинул пустые — safe_str не нужен
+    return el.get_text(" ", strip=True)
+
+
+# Подстроки class, которые ищем внутри карточки выдачи
+_CLASS_NEEDLES: Tuple[str, ...] = (
+    "search-business-snippet-view__title",
+    "search-business-snippet-viewtitle",
+    "search-business-snippet-view__address",
+    "search-business-snippet-viewaddress",
+    "search-business-snippet-view__category",
+    "search-business-snippet-viewcategory",
+    "business-working-status-view",
+    "business-rating-badge-view__rating-text",
+    "business-rating-badge-viewrating-text",
+    "business-rating-amount-view",
+)
+# Подстрока, общая для всех _CLASS_NEEDLES: одна проверка отсеивает "чужие" классы
+_CLASS_PREFILTER = "business-"
+
+_SIDE_PANEL_ITEM_SELECTOR = '[data-object="search-list-item"][data-id]'
+
+# Текст внутри этих тегов get_text() в bs4 не учитывает — lexbor-ветка повторяет это
+_NON_TEXT_PARENTS = frozenset({"script", "style", "template"})
+
+
+@functools.lru_cache(maxsize=1024)
+def _class_needles(cls: str) -> Tuple[str, ...]:
+    """
+    Какие _CLASS_NEEDLES содержит строка class. Набор классов в выдаче повторяется
+    от карточки к карточке, поэтому результат кешируется по самой строке.
+    """
+    if _CLASS_PREFILTER not in cls:
+        return ()
+    return tuple(needle for needle in _CLASS_NEEDLES if needle in cls)
+
 
+def _index_by_class_contains(tag) -> Dict[str, List[Any]]:
+    """
+    Один обход потомков tag: needle -> элементы (в порядке документа), у которых
+    class содержит needle. Заменяет отдельный find() с lambda на каждую подстроку.
+    """
+    from bs4 import Tag
 
-def _digits(s: str) -> str:
-    s = safe_str(s)
-    return "".join(ch for ch in s if ch.isdigit())
+    found: Dict[str, List[Any]] = {}
+    for el in tag.descendants:
+        if not isinstance(el, Tag):
+            continue
+        cls = el.get("class")
+        if not cls:
+            continue
+        s = " ".join(cls) if isinstance(cls, list) else cls
+        for needle in _class_needles(s):
+            found.setdefault(needle, []).append(el)
+    return found
 
 
-def parse_side_panel_items(html: str) -> List[Dict[str, Any]]:
+@functools.cache
+def _lexbor_parser_cls():
     """
-    Парсит боковой список выдачи Яндекс.Карт из HTML.
+    selectolax (lexbor, C) — опционально: разбор и обход DOM в разы быстрее bs4.
+    Без него используется BeautifulSoup(html.parser).
+    """
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+    except ImportError:
+        return None
+    return LexborHTMLParser
+
+
+def _lexbor_text(node) -> str:
+    # то же, что el.get_text(" ", strip=True) в bs4
+    parts: List[str] = []
+    for t in node.traverse(include_text=True):
+        if t.tag != "-text" or t.parent.tag in _NON_TEXT_PARENTS:
+            continue
+        s = t.text_content.strip()
+        if s:
+            parts.append(s)
+    return " ".join(parts)
 
-    ВАЖНО:
-    - В выдаче рядом с рейтингом чаще всего отображается именно количество ОЦЕНОК.
-    - Количество отзывов чаще доступно на карточке организации (WEB-enrich).
+
+def _lexbor_side_panel_parts(n) -> Tuple[Dict[str, List[str]], str]:
+    """
+    (needle -> тексты элементов, href ссылки-оверлея) по потомкам узла n.
     """
-    soup = BeautifulSoup(html or "", "html.parser")
-    nodes = soup.select('[data-object="search-list-item"][data-id]')
+    texts: Dict[str, List[str]] = {}
+    href = ""
+    it = n.traverse()
+    next(it)  # сам n: как и find()/select_one() в bs4, смотрим только потомков
+    for el in it:
+        attrs = el.attributes
+        cls = attrs.get("class") or ""
+        if not href and el.tag == "a" and "href" in attrs and "link-overlay" in cls.split():
+            href = safe_str(attrs["href"])
+        needles = _class_needles(cls)
+        if not needles:
+            continue
+        text = _lexbor_text(el)
+        for needle in needles:
+            texts.setdefault(needle, []).append(text)
+    return texts, href
+
+
+def _side_panel_item(oid: str, coords: str, texts: Dict[str, List[str]], href: str) -> Dict[str, Any]:
+    """
+    Поля карточки по текстам найденных элементов (needle -> тексты в порядке документа).
+    """
+    def first(needle: str) -> str:
+        found = texts.get(needle)
+        return found[0] if found else ""
+
+    lon, lat = "", ""
+    if coords and "," in coords:  # "lon,lat"
+        a, b = coords.split(",", 1)
+        lon, lat = safe_str(a), safe_str(b)
+
+    title = first("search-business-snippet-view__title") or first("search-business-snippet-viewtitle")
+    address = first("search-business-snippet-view__address") or first("search-business-snippet-viewaddress")
+    category = first("search-business-snippet-view__category") or first("search-business-snippet-viewcategory")
+    worktime = first("business-working-status-view")
+
+    # первый найденный элемент рейтинга (даже пустой), иначе запасной класс
+    if "business-rating-badge-view__rating-text" in texts:
+        rating = first("business-rating-badge-view__rating-text")
+    else:
+        rating = first("business-rating-badge-viewrating-text")
+    rating = rating.replace(",", ".")
+
+    # --- Количество оценок / отзывов (если встречается в выдаче)
+    rating_count = ""
+    review_count = ""
+
+    # Часто встречается span business-rating-amount-view _summary:
+    # "598 оценок" / "123 отзыва"
+    amounts = texts.get("business-rating-amount-view", ())
+    for t in amounts:
+        t = t.lower()
+        d = digits_only(t)
+        if not d:
+            continue
+        if ("оцен" in t) and (not rating_count):
+            rating_count = d
+        if ("отзыв" in t) and (not review_count):
+            review_count = d
+
+    # Если текст без слов (например "(5725)") — считаем это количеством оценок.
+    if not rating_count and amounts:
+        d = digits_only(amounts[0])
+        if d:
+            rating_count = d
+
+    if href[:1] == "/":  # относительная ссылка; срез быстрее вызова startswith
+        href = _YANDEX_ORIGIN + href
+
+    return {
+        "oid": oid,
+        "title": title,
+        "address": address,
+        "worktime": worktime,
+        "category": category,
+        "rating": rating,
+        "rating_count": rating_count,
+        "review_count": review_count,
+        "lon": lon,
+        "lat": lat,
+        "href": href,
+    }
+
+
+def _parse_side_panel_items_lexbor(parser_cls, html: Union[str, bytes]) -> List[Dict[str, Any]]:
+    # bytes отдаём lexbor как есть (UTF-8): без decode в str и обратного encode внутри selectolax
+    tree = parser_cls(html or "")
     items: List[Dict[str, Any]] = []
+    seen: Set[str] = set()
 
-    for n in nodes:
-        oid = safe_str(n.get("data-id"))
-        coords = safe_str(n.get("data-coordinates"))  # "lon,lat"
-        lon, lat = "", ""
-        if coords and "," in coords:
-            a, b = coords.split(",", 1)
-            lon, lat = safe_str(a), safe_str(b)
+    for n in tree.css(_SIDE_PANEL_ITEM_SELECTOR):
+        attrs = n.attributes
+        oid = safe_str(attrs.get("data-id"))
+        # uniq by oid — сразу, не разбирая повторную карточку
+        if not oid or oid in seen:
+            continue
+        seen.add(oid)
 
-        def first_by_class_contains(tag, needle: str):
-            return tag.find(True, class_=lambda c: isinstance(c, str) and needle in c)
+        texts, href = _lexbor_side_panel_parts(n)
+        items.append(_side_panel_item(oid, safe_str(attrs.get("data-coordinates")), texts, href))
 
-        title = _text(first_by_class_contains(n, "search-business-snippet-view__title")) or \
-                _text(first_by_class_contains(n, "search-business-snippet-viewtitle"))
+    return items
 
-        address = _text(first_by_class_contains(n, "search-business-snippet-view__address")) or \
-                  _text(first_by_class_contains(n, "search-business-snippet-viewaddress"))
 
-        category = _text(first_by_class_contains(n, "search-business-snippet-view__category")) or \
-                   _text(first_by_class_contains(n, "search-business-snippet-viewcategory"))
+def parse_side_panel_items(html: Union[str, bytes]) -> List[Dict[str, Any]]:
+    """
+    Парсит боковой список выдачи Яндекс.Карт из HTML.
 
-        worktime = _text(first_by_class_contains(n, "business-working-status-view"))
+    ВАЖНО:
+    - В выдаче рядом с рейтингом чаще всего отображается именно количество ОЦЕНОК.
+    - Количество отзывов чаще доступно на карточке организации (WEB-enrich).
+    """
+    # Нет ни одной карточки выдачи — нечего и строить дерево (поиск подстроки идёт по байтам, без декодирования)
+    if not html or _ITEM_MARKER[isinstance(html, bytes)] not in html:
+        return []
 
-        rating_el = first_by_class_contains(n, "business-rating-badge-view__rating-text") or \
-                    first_by_class_contains(n, "business-rating-badge-viewrating-text")
-        rating = _text(rating_el).replace(",", ".")
+    parser_cls = _lexbor_parser_cls()
+    if parser_cls is not None:
+        return _parse_side_panel_items_lexbor(parser_cls, html)
 
-        # --- Количество оценок / отзывов (если встречается в выдаче)
-        rating_count = ""
-        review_count = ""
+    from bs4 import BeautifulSoup, SoupStrainer
 
-        # Часто встречается span business-rating-amount-view _summary:
-        # "598 оценок" / "123 отзыва"
-        for el in n.find_all(True, class_=lambda c: isinstance(c, str) and "business-rating-amount-view" in c):
-            t = _text(el).lower()
-            d = _digits(t)
-            if not d:
-                continue
-            if ("оцен" in t) and (not rating_count):
-                rating_count = d
-            if ("отзыв" in t) and (not review_count):
-                review_count = d
-
-        # Если текст без слов (например "(5725)") — считаем это количеством оценок.
-        if not rating_count:
-            cnt_el = first_by_class_contains(n, "business-rating-amount-view")
-            cnt_text = _text(cnt_el)
-            d = _digits(cnt_text)
-            if d:
-                rating_count = d
+    if isinstance(html, bytes):
+        html = _decode_html(html)
+
+    # В дерево попадают только карточки выдачи (с потомками), остальная страница пропускается
+    strainer = SoupStrainer(attrs={"data-object": "search-list-item"})
+    soup = BeautifulSoup(html or "", "html.parser", parse_only=strainer)
+    nodes = soup.find_all(attrs={"data-object": "search-list-item", "data-id": True})
+    items: List[Dict[str, Any]] = []
+    seen: Set[str] = set()
+
+    for n in nodes:
+        oid = safe_str(n.get("data-id"))
+        # uniq by oid — сразу, не разбирая повторную карточку
+        if not oid or oid in seen:
+            continue
+        seen.add(oid)
+
+        texts = {needle: [_text(el) for el in els] for needle, els in _index_by_class_contains(n).items()}
 
         href = ""
         a_overlay = n.select_one("a.link-overlay[href]")
         if a_overlay:
             href = safe_str(a_overlay.get("href"))
-            if href.startswith("/"):
-                href = "https://yandex.ru" + href
-
-        items.append({
-            "oid": oid,
-            "title": title,
-            "address": address,
-            "worktime": worktime,
-            "category": category,
-            "rating": rating,
-            "rating_count": rating_count,
-            "review_count": review_count,
-            "lon": lon,
-            "lat": lat,
-            "href": href,
-        })
-
-    # uniq by oid
-    seen = set()
-    out: List[Dict[str, Any]] = []
-    for it in items:
-        oid = safe_str(it.get("oid"))
-        if not oid or oid in seen:
-            continue
-        seen.add(oid)
-        out.append(it)
 
-    return out
+        items.append(_side_panel_item(oid, safe_str(n.get("data-coordinates")), texts, href))
+
+    return items
 
 
-def build_companies_from_offline_html(html: str, source_name: str) -> Tuple[List[Company], Dict[str, Any]]:
+def _build_companies(items: List[Dict[str, Any]], scrolled_to_end: bool, source_name: str) -> Tuple[List[Company], Dict[str, Any]]:
     warnings: List[str] = []
 
-    if not offline_html_is_scrolled_to_end(html):
+    if not scrolled_to_end:
         msg = "Похоже, выдача НЕ пролистана до конца (нет блока add-business-view)."
         log(f"[OFFLINE_HTML][WARN] {source_name}: {ANSI_YELLOW}{msg}{ANSI_RESET}")
         warnings.append(f"{source_name}: {msg}")
 
-    items = parse_side_panel_items(html)
     log(f"[OFFLINE_HTML] {source_name}: items={len(items)}")
 
-    companies: List[Company] = []
-    for it in items:
-        oid = safe_str(it.get("oid"))
-        c = Company(
-            ID=oid,
-            Название=safe_str(it.get("title")),
-            Адрес=safe_str(it.get("address")),
-            Долгота=safe_str(it.get("lon")),
-            Широта=safe_str(it.get("lat")),
-            Режим_работы=safe_str(it.get("worktime")),
-            Рейтинг=safe_str(it.get("rating")),
-            Количество_оценок=safe_str(it.get("rating_count")),    # <-- ВАЖНО: оценки
-            Количество_отзывов=safe_str(it.get("review_count")),    # обычно пусто и добирается WEB-enrich
-            Категория_1=safe_str(it.get("category")),
-            uri=f"ymapsbm1://org?oid={oid}" if oid else "",
+    # Значения в items — уже готовые строки из _side_panel_item (через safe_str), повторно не чистим
+    companies: List[Company] = [
+        Company(
+            ID=it["oid"],
+            Название=it["title"],
+            Адрес=it["address"],
+            Долгота=it["lon"],
+            Широта=it["lat"],
+            Режим_работы=it["worktime"],
+            Рейтинг=it["rating"],
+            Количество_оценок=it["rating_count"],    # <-- ВАЖНО: оценки
+            Количество_отзывов=it["review_count"],    # обычно пусто и добирается WEB-enrich
+            Категория_1=it["category"],
+            uri=f"ymapsbm1://org?oid={it['oid']}",
             raw_json=json_dumps_safe({"source": source_name, "item": it}),
         )
-        companies.append(c)
+        for it in items
+    ]
 
     meta = {"warnings": warnings, "items": len(items), "source": source_name}
     return companies, meta
 
 
+def build_companies_from_offline_html(html: Union[str, bytes], source_name: str) -> Tuple[List[Company], Dict[str, Any]]:
+    return _build_companies(parse_side_panel_items(html), offline_html_is_scrolled_to_end(html), source_name)
+
+
+def side_panel_items_from_parts(parts: List[Any]) -> List[Dict[str, Any]]:
+    """
+    То же, что parse_side_panel_items, но по частям карточек, собранным прямо в браузере
+    (SELENIUM, без page_source и разбора HTML). Карточка:
+    [data-id, data-coordinates, href ссылки-оверлея, [[class, [сырые текстовые узлы]], ...]] —
+    по всем потомкам, у которых class содержит _CLASS_PREFILTER.
+    """
+    items: List[Dict[str, Any]] = []
+    seen: Set[str] = set()
+
+    for oid, coords, href, classed in parts:
+        oid = safe_str(oid)
+        # uniq by oid — как и при разборе HTML, остаётся первая карточка
+        if not oid or oid in seen:
+            continue
+        seen.add(oid)
+
+        texts: Dict[str, List[str]] = {}
+        for cls, raw in classed:
+            needles = _class_needles(cls or "")
+            if not needles:
+                continue
+            # как get_text(" ", strip=True): strip каждого узла, пустые выкидываем
+            text = " ".join(t for t in (r.strip() for r in raw) if t)
+            for needle in needles:
+                texts.setdefault(needle, []).append(text)
+
+        items.append(_side_panel_item(oid, safe_str(coords), texts, safe_str(href)))
+
+    return items
+
+
+def build_companies_from_side_panel_parts(
+    parts: List[Any], scrolled_to_end: bool, source_name: str
+) -> Tuple[List[Company], Dict[str, Any]]:
+    return _build_companies(side_panel_items_from_parts(parts), scrolled_to_end, source_name)
+
+
+def _read_offline_file(fp: Path) -> Tuple[Optional[bytes], str]:
+    # (байты html, "") или (None, текст ошибки чтения); декодирует уже парсер
+    try:
+        return fp.read_bytes(), ""
+    except Exception as e:
+        return None, f"{fp.name}: read_error: {e}"
+
+
+def _build_from_read(fp: Path, read: Tuple[Optional[bytes], str]) -> Tuple[Optional[List[Company]], Any]:
+    html, err = read
+    if html is None:
+        return None, err
+    return build_companies_from_offline_html(html, source_name=fp.name)
+
+
+def _parse_offline_file(fp: Path) -> Tuple[Optional[List[Company]], Any]:
+    """
+    Чтение + разбор одного файла (выполняется в отдельном процессе).
+    Возвращает (companies, meta) или (None, текст ошибки чтения).
+    """
+    return _build_from_read(fp, _read_offline_file(fp))
+
+
+def _parse_offline_files(files: List[Path]) -> List[Tuple[Optional[List[Company]], Any]]:
+    # Разбор BeautifulSoup упирается в CPU: несколько файлов — по процессам (обходим GIL).
+    # Порядок результатов совпадает с порядком files.
+    # concurrent.futures (+ multiprocessing) импортируется лениво: ≈10 мс на старте CLI.
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    workers = min(len(files), available_cpus())
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                return list(ex.map(_parse_offline_file, files))
+        except (OSError, RuntimeError) as e:
+            # Нет поддержки процессов в окружении — разбираем последовательно
+            log(f"[OFFLINE_HTML][WARN] process pool unavailable: {e}")
+
+    if len(files) == 1:
+        return [_parse_offline_file(files[0])]
+
+    # Один процесс: чтение файлов идёт в потоках и перекрывается с разбором уже прочитанных
+    with ThreadPoolExecutor(max_workers=min(len(files), 8)) as ex:
+        return [_build_from_read(fp, read) for fp, read in zip(files, ex.map(_read_offline_file, files))]
+
+
+# Все поля Company: при слиянии дублей по ID читаются одним вызовом attrgetter
+_COMPANY_FIELDS: Tuple[str, ...] = tuple(f.name for f in fields(Company))
+_get_company_fields = attrgetter(*_COMPANY_FIELDS)
+
+
+def _fill_empty_fields(dst: Company, src: Company) -> None:
+    # дополняем только пустые поля dst (первая встреченная запись остаётся основной)
+    for name, cur, new in zip(_COMPANY_FIELDS, _get_company_fields(dst), _get_company_fields(src)):
+        if not cur and new:
+            setattr(dst, name, new)
+
+
 def read_offline_input(input_path: str) -> Tuple[List[Company], Dict[str, Any], str]:
     files = iter_offline_html_files(input_path)
     if not files:
         return [], {"warnings": [f"OFFLINE_HTML_INPUT not found or no *.html: {input_path}"]}, "offline_html_missing"
 
     warnings: List[str] = []
-    all_companies: List[Company] = []
     per_source: List[Dict[str, Any]] = []
+    # uniq by ID на все файлы; dict сохраняет порядок первой встречи
+    by_id: Dict[str, Company] = {}
 
-    for fp in files:
-        try:
-            html = fp.read_text(encoding="utf-8", errors="ignore")
-        except Exception as e:
-            warnings.append(f"{fp.name}: read_error: {e}")
+    for companies, meta in _parse_offline_files(files):
+        if companies is None:
+            warnings.append(meta)
             continue
 
-        companies, meta = build_companies_from_offline_html(html, source_name=fp.name)
-        all_companies.extend(companies)
+        for c in companies:
+            oid = safe_str(c.ID)
+            if not oid:
+                continue
+            first = by_id.get(oid)
+            if first is None:
+                by_id[oid] = c
+            else:
+                # тот же ID в другом снимке выдачи — добираем поля, которых не было в первом
+                _fill_empty_fields(first, c)
         per_source.append(meta)
 
-    # uniq by ID
-    seen = set()
-    uniq: List[Company] = []
-    for c in all_companies:
-        oid = safe_str(c.ID)
-        if not oid or oid in seen:
-            continue
-        seen.add(oid)
-        uniq.append(c)
-
+    uniq = list(by_id.values())
     meta_all = {"warnings": warnings, "sources": per_source, "rows": len(uniq)}
     return uniq, meta_all, ""
@@ -3,18 +3,23 @@
 
 from __future__ import annotations
 
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from .config import Settings
 from .excel_writer import save_to_excel
 from .models import Company, RunResult
 from .offline_html import read_offline_input
-from .selenium_manual_maps import collect_companies_from_selenium_live_maps
-from .selenium_pool import SeleniumPool
-from .utils import bbox_from_center_diameter_km, now_iso_local, now_str_for_filename, safe_str
-from .web_enrich import enrich_companies_web
-from .yandex_api import fetch_by_uri, search_bbox
+from .utils import RateLimiter, bbox_from_center_diameter_km, now_iso_local, now_str_for_filename, safe_str
+from .yandex_api import acquire_api_session, fetch_by_uri, release_api_session, search_bbox
+
+# Selenium-часть (пул, live-сбор, WEB-enrich) импортируется в тех ветках run(), где нужна:
+# MODE=ONLINEAPI/OFFLINEHTML без WEB-enrich её не загружает
+if TYPE_CHECKING:
+    import requests
+
+    from .selenium_pool import SeleniumPool
 
 
 def _build_request_meta(st: Settings) -> Dict[str, Any]:
@@ -31,19 +36,93 @@ def _build_request_meta(st: Settings) -> Dict[str, Any]:
         "RESULTS_PER_PAGE": st.RESULTS_PER_PAGE,
         "MAX_SKIP": st.MAX_SKIP,
         "SLEEP_SEC": st.SLEEP_SEC,
+        "URI_REQUERY_WORKERS": st.URI_REQUERY_WORKERS,
+        "API_PAGE_WORKERS": st.API_PAGE_WORKERS,
         "ENABLE_URI_REQUERY": st.ENABLE_URI_REQUERY,
         "ENABLE_WEB_FALLBACK_FOR_RATING": st.ENABLE_WEB_FALLBACK_FOR_RATING,
         "WEB_FORCE_OVERWRITE": st.WEB_FORCE_OVERWRITE,
         "WEB_MAX_ITEMS": st.WEB_MAX_ITEMS,
+        "WEB_WORKERS": st.WEB_WORKERS,
+        "WEB_PARSE_PROCESSES": st.WEB_PARSE_PROCESSES,
         "SELENIUM_HEADLESS": st.SELENIUM_HEADLESS,
+        "SELENIUM_DISABLE_IMAGES": st.SELENIUM_DISABLE_IMAGES,
         "apikey_present": bool(st.YMAPIKEY),
     }
 
 
+# Поля, которые uri-requery дополняет (только если в компании они пусты)
+_REQUERY_ATTRS: Tuple[str, ...] = (
+    "Индекс",
+    "Сайт",
+    "Телефон_1",
+    "Телефон_2",
+    "Телефон_3",
+    "Email_1",
+    "Email_2",
+    "Email_3",
+    "Режим_работы",
+    "Рейтинг",
+    "Количество_оценок",     # <-- НОВОЕ
+    "Количество_отзывов",
+    "Категория_1",
+    "Категория_2",
+    "Категория_3",
+    "Особенности",
+    "Факс_1",
+    "Факс_2",
+    "Факс_3",
+    "Категории_прочие",
+)
+# Company — slots-dataclass (без __dict__): все значения за один C-вызов
+_get_requery_attrs = attrgetter(*_REQUERY_ATTRS)
+
+
+def _fetch_by_uris(st: Settings, uris: List[str]) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+    """
+    fetch_by_uri по списку uri. Результаты — в порядке uris: (json, None) или (None, ошибка).
+
+    Запросы I/O-bound, поэтому идут в URI_REQUERY_WORKERS потоков. У каждого потока своя
+    requests.Session (Session не потокобезопасна): соединения переиспользуются (keep-alive).
+    Сессии берутся из простаивающих (acquire_api_session) — первый поток получает уже открытое
+    соединение search_bbox — и возвращаются туда же. SLEEP_SEC — минимальный интервал между
+    запросами, общий для всех потоков (RateLimiter, как в search_bbox).
+    """
+    import threading
+
+    limiter = RateLimiter(st.SLEEP_SEC)
+    local = threading.local()
+    sessions: List[requests.Session] = []
+
+    def fetch_one(uri: str) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = acquire_api_session()
+            sessions.append(session)
+        limiter.acquire()
+        try:
+            return fetch_by_uri(st, uri=uri, session=session), None
+        except Exception as e:
+            return None, e
+
+    workers = max(1, min(int(st.URI_REQUERY_WORKERS or 1), len(uris)))
+    try:
+        if workers == 1:
+            return [fetch_one(uri) for uri in uris]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(fetch_one, uris))
+    finally:
+        for session in sessions:
+            release_api_session(session)
+
+
 def _apply_uri_requery_if_needed(st: Settings, companies: List[Company]) -> Dict[str, Any]:
     """
     Логика:
     - Если ENABLE_URI_REQUERY=True и есть YMAPIKEY, делаем fetch_by_uri по c.uri
+      (запросы параллельно, см. _fetch_by_uris)
     - Если в ответе пришёл feature, парсим его и заполняем пустые поля
       (только дополнение пустых, без переписывания).
     """
@@ -54,20 +133,19 @@ def _apply_uri_requery_if_needed(st: Settings, companies: List[Company]) -> Dict
         return {"enabled": True, "skipped": "YMAPIKEY empty"}
 
     changed = 0
-    attempted = 0
     errors: List[str] = []
 
     from .yandex_api import company_from_feature
 
-    for c in companies:
-        uri = safe_str(c.uri)
-        if not uri:
-            continue
-
-        attempted += 1
+    todo = [(c, uri) for c in companies if (uri := safe_str(c.uri))]
+    fetched = _fetch_by_uris(st, [uri for _c, uri in todo])
 
+    # Ответы применяем в исходном порядке компаний (в основном потоке)
+    for (c, _uri), (j, fetch_err) in zip(todo, fetched):
         try:
-            j = fetch_by_uri(st, uri=uri)
+            if fetch_err is not None:
+                raise fetch_err
+
             feats = j.get("features") or []
             f0 = feats[0] if isinstance(feats, list) and feats else None
             if not isinstance(f0, dict):
@@ -77,41 +155,17 @@ def _apply_uri_requery_if_needed(st: Settings, companies: List[Company]) -> Dict
             if not c2:
                 continue
 
-            def fill_if_empty(attr: str) -> None:
-                nonlocal changed
-                if safe_str(getattr(c, attr)) or not safe_str(getattr(c2, attr)):
-                    return
-                setattr(c, attr, getattr(c2, attr))  # type: ignore[misc]
+            # дополняем только пустые поля; значения обеих записей — одним вызовом attrgetter
+            for attr, cur, new in zip(_REQUERY_ATTRS, _get_requery_attrs(c), _get_requery_attrs(c2)):
+                if safe_str(cur) or not safe_str(new):
+                    continue
+                setattr(c, attr, new)
                 changed += 1
 
-            for attr in (
-                "Индекс",
-                "Сайт",
-                "Телефон_1",
-                "Телефон_2",
-                "Телефон_3",
-                "Email_1",
-                "Email_2",
-                "Email_3",
-                "Режим_работы",
-                "Рейтинг",
-                "Количество_оценок",     # <-- НОВОЕ
-                "Количество_отзывов",
-                "Категория_1",
-                "Категория_2",
-                "Категория_3",
-                "Особенности",
-                "Факс_1",
-                "Факс_2",
-                "Факс_3",
-                "Категории_прочие",
-            ):
-                fill_if_empty(attr)
-
         except Exception as e:
             errors.append(f"{c.ID}: {e}")
 
-    return {"enabled": True, "attempted": attempted, "changed_fields": changed, "errors": errors}
+    return {"enabled": True, "attempted": len(todo), "changed_fields": changed, "errors": errors}
 
 
 def run(st: Settings) -> RunResult:
@@ -124,61 +178,73 @@ def run(st: Settings) -> RunResult:
     request_meta = _build_request_meta(st)
     companies: List[Company] = []
 
-    # --- Источник данных (MODE) ---
-    if st.MODE == "ONLINEAPI":
-        bbox = bbox_from_center_diameter_km(st.CENTER_LON, st.CENTER_LAT, st.DIAMETER_KM)
-        request_meta["bbox"] = bbox
-
-        companies, api_meta, err = search_bbox(st, bbox=bbox)
-        request_meta["api_meta"] = api_meta
-
-        # ВАЖНО: НЕ выходим. Сохраняем то, что успели собрать.
-        if err:
-            request_meta["error"] = err
-            request_meta["partial"] = True
-
-    elif st.MODE == "OFFLINEHTML":
-        companies, offline_meta, err = read_offline_input(st.OFFLINE_HTML_INPUT)
-        request_meta["offline_meta"] = offline_meta
-
-        if err:
-            request_meta["error"] = err
-            request_meta["saved"] = outpath
-            request_meta["rows"] = 0
-            save_to_excel(st, [], outpath, request_meta)
-            return RunResult(companies=[], request_meta=request_meta)
-
-    elif st.MODE == "SELENIUM":
-        companies, selenium_meta, err = collect_companies_from_selenium_live_maps(st)
-        request_meta["selenium_meta"] = selenium_meta
+    # Один SeleniumPool на прогон: live-сбор и WEB-enrich работают через один driver.
+    pool: Optional[SeleniumPool] = None
 
-        if err:
-            request_meta["error"] = err
+    enrich_stats: Dict[str, Any] = {}
+    try:
+        # --- Источник данных (MODE) ---
+        if st.MODE == "ONLINEAPI":
+            bbox = bbox_from_center_diameter_km(st.CENTER_LON, st.CENTER_LAT, st.DIAMETER_KM)
+            request_meta["bbox"] = bbox
+
+            companies, api_meta, err = search_bbox(st, bbox=bbox)
+            request_meta["api_meta"] = api_meta
+
+            # ВАЖНО: НЕ выходим. Сохраняем то, что успели собрать.
+            if err:
+                request_meta["error"] = err
+                request_meta["partial"] = True
+
+        elif st.MODE == "OFFLINEHTML":
+            companies, offline_meta, err = read_offline_input(st.OFFLINE_HTML_INPUT)
+            request_meta["offline_meta"] = offline_meta
+
+            if err:
+                request_meta["error"] = err
+                request_meta["saved"] = outpath
+                request_meta["rows"] = 0
+                save_to_excel(st, [], outpath, request_meta)
+                return RunResult(companies=[], request_meta=request_meta)
+
+        elif st.MODE == "SELENIUM":
+            from .selenium_manual_maps import collect_companies_from_selenium_live_maps
+            from .selenium_pool import SeleniumPool
+
+            pool = SeleniumPool(st, keep_chrome_open=bool(st.SELENIUM_KEEP_CHROME_OPEN))
+            companies, selenium_meta, err = collect_companies_from_selenium_live_maps(st, pool)
+            request_meta["selenium_meta"] = selenium_meta
+
+            if err:
+                request_meta["error"] = err
+                request_meta["saved"] = outpath
+                request_meta["rows"] = 0
+                save_to_excel(st, [], outpath, request_meta)
+                return RunResult(companies=[], request_meta=request_meta)
+
+        else:
+            request_meta["error"] = f"Unsupported MODE: {st.MODE}"
             request_meta["saved"] = outpath
             request_meta["rows"] = 0
             save_to_excel(st, [], outpath, request_meta)
             return RunResult(companies=[], request_meta=request_meta)
 
-    else:
-        request_meta["error"] = f"Unsupported MODE: {st.MODE}"
-        request_meta["saved"] = outpath
-        request_meta["rows"] = 0
-        save_to_excel(st, [], outpath, request_meta)
-        return RunResult(companies=[], request_meta=request_meta)
+        # --- Enrich-цепочка ---
+        if st.OFFLINE_ENRICH_MODE in ("API", "APIWEB"):
+            enrich_stats["uri_requery"] = _apply_uri_requery_if_needed(st, companies)
 
-    # --- Enrich-цепочка ---
-    enrich_stats: Dict[str, Any] = {}
-
-    if st.OFFLINE_ENRICH_MODE in ("API", "APIWEB"):
-        enrich_stats["uri_requery"] = _apply_uri_requery_if_needed(st, companies)
+        if st.OFFLINE_ENRICH_MODE in ("WEB", "APIWEB"):
+            from .selenium_pool import SeleniumPool
+            from .web_enrich import enrich_companies_web
 
-    if st.OFFLINE_ENRICH_MODE in ("WEB", "APIWEB"):
-        pool = SeleniumPool(st, keep_chrome_open=(st.MODE == "SELENIUM" and st.SELENIUM_KEEP_CHROME_OPEN))
-        try:
+            if pool is None:
+                pool = SeleniumPool(st)
             enrich_stats["web"] = enrich_companies_web(st, companies, pool)
-        finally:
-            if not (st.MODE == "SELENIUM" and st.SELENIUM_KEEP_CHROME_OPEN):
-                pool.close()
+    finally:
+        # Chrome/driver закрываем и при исключении в сборе, uri-requery или enrich;
+        # close() сам учитывает keep_chrome_open (MODE=SELENIUM)
+        if pool is not None:
+            pool.close()
 
     request_meta["enrich_stats"] = enrich_stats
 
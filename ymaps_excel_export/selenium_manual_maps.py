@@ -2,13 +2,14 @@
 
 from __future__ import annotations
 
+import json
 import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from .config import Settings
 from .models import Company
-from .offline_html import build_companies_from_offline_html
-from .selenium_pool import SeleniumPool, selenium_is_blocked
+from .offline_html import _CLASS_PREFILTER, build_companies_from_side_panel_parts
+from .selenium_pool import SeleniumPool, cdp_eval_script, selenium_is_blocked, wait_challenge_solved
 from .utils import log, safe_str
 
 
@@ -24,18 +25,50 @@ def _safe_input(prompt: str) -> None:
         log("[SELENIUM][WARN] input() -> EOFError (нет stdin). Продолжаем без ожидания Enter.")
 
 
+def _find_maps_tab_cdp(driver) -> Optional[Tuple[str, str]]:
+    """
+    (handle, url) первой вкладки Я.Карт по одному CDP Target.getTargets
+    (у chromedriver handle вкладки == targetId); ("", "") — вкладки нет.
+    None — CDP недоступен, искать перебором вкладок.
+    """
+    execute_cdp_cmd = getattr(driver, "execute_cdp_cmd", None)
+    if execute_cdp_cmd is None:
+        return None
+    try:
+        targets = execute_cdp_cmd("Target.getTargets", {}).get("targetInfos") or []
+    except Exception:
+        return None
+
+    handles = set(driver.window_handles)
+    for t in targets:
+        url = safe_str(t.get("url"))
+        if t.get("type") == "page" and t.get("targetId") in handles and _is_yandex_maps_url(url):
+            return t["targetId"], url
+    return "", ""
+
+
 def _ensure_maps_tab(driver, url: str) -> Dict[str, Any]:
     meta: Dict[str, Any] = {"found_existing_tab": False, "opened_new_tab": False, "tab_url": ""}
 
     # 1) найти уже открытую вкладку Я.Карт
     try:
-        for h in list(driver.window_handles):
-            driver.switch_to.window(h)
-            cur = safe_str(driver.current_url)
-            if _is_yandex_maps_url(cur):
+        found = _find_maps_tab_cdp(driver)
+        if found is not None:
+            handle, cur = found
+            if handle:
+                driver.switch_to.window(handle)
                 meta["found_existing_tab"] = True
                 meta["tab_url"] = cur
                 return meta
+        else:
+            # без CDP — перебор вкладок (switch_to + current_url на каждую)
+            for h in list(driver.window_handles):
+                driver.switch_to.window(h)
+                cur = safe_str(driver.current_url)
+                if _is_yandex_maps_url(cur):
+                    meta["found_existing_tab"] = True
+                    meta["tab_url"] = cur
+                    return meta
     except Exception:
         pass
 
@@ -57,25 +90,33 @@ def _ensure_maps_tab(driver, url: str) -> Dict[str, Any]:
     return meta
 
 
-def _js_bool(driver, script: str) -> bool:
+def _js_scroll_state(driver, script: str) -> Tuple[int, int, bool]:
+    """
+    Выполняет скрипт, возвращающий [кол-во элементов, высота body, маркер конца].
+    Ошибка JS/драйвера -> (0, 0, False).
+    """
     try:
-        return bool(driver.execute_script(script))
+        cnt, h, end = cdp_eval_script(driver, script)
+        return int(cnt or 0), int(h or 0), bool(end)
     except Exception:
-        return False
+        return 0, 0, False
 
 
-def _js_int(driver, script: str) -> int:
-    try:
-        v = driver.execute_script(script)
-        return int(v) if v is not None else 0
-    except Exception:
-        return 0
+# JS-глобал с найденным контейнером прокрутки (живёт, пока открыта страница)
+_SCROLL_EL_CACHE_JS = "window.__ymScrollEl"
 
 
-def _find_scrollable_container_js(list_item_css: str) -> str:
+def _find_scrollable_container_js(list_item_css: str, reset: bool = False) -> str:
     # Пытаемся найти ближайший скроллящийся контейнер вокруг элемента выдачи.
+    # Найденный контейнер кешируем в window.__ymScrollEl: обход предков с getComputedStyle
+    # (форсирует layout) делаем один раз, а не на каждом шаге. Фолбэк на документ не кешируем —
+    # элементы выдачи могут появиться позже. reset=True — сбросить кеш (старт прокрутки).
     return f"""
     (function() {{
+      {"" if not reset else _SCROLL_EL_CACHE_JS + " = null;"}
+      const cached = {_SCROLL_EL_CACHE_JS};
+      if (cached && cached.isConnected) return cached;
+
       const item = document.querySelector({list_item_css!r});
       if (!item) return document.scrollingElement || document.documentElement;
 
@@ -85,6 +126,7 @@ def _find_scrollable_container_js(list_item_css: str) -> str:
         const st = window.getComputedStyle(el);
         const oy = (st && st.overflowY) ? st.overflowY : '';
         if (el.scrollHeight > el.clientHeight + 20 && (oy === 'auto' || oy === 'scroll')) {{
+          {_SCROLL_EL_CACHE_JS} = el;
           return el;
         }}
         el = el.parentElement;
@@ -94,6 +136,29 @@ def _find_scrollable_container_js(list_item_css: str) -> str:
     """
 
 
+def _scroll_state_js(st: Settings, scroll_el_js: Optional[str]) -> str:
+    """
+    Один вызов execute_script на шаг: маркер конца + счётчик элементов + высота,
+    и (если scroll_el_js задан и конца нет) прокрутка контейнера в самый низ.
+    """
+    scroll = ""
+    if scroll_el_js:
+        scroll = f"""
+        if (!end) {{
+          const el = {scroll_el_js};
+          if (el) el.scrollTop = el.scrollHeight;
+        }}
+        """
+    return f"""
+    // “конец списка” (маркер как в offline_html эвристике)
+    const end = !!document.querySelector({st.SELENIUM_END_MARKER_CSS!r});
+    const cnt = document.querySelectorAll({st.SELENIUM_LIST_ITEM_CSS!r}).length;
+    const h = document.body ? document.body.scrollHeight : 0;
+    {scroll}
+    return [cnt, h, end];
+    """
+
+
 def _scroll_side_panel_to_end(driver, st: Settings) -> Dict[str, Any]:
     meta: Dict[str, Any] = {
         "enabled": True,
@@ -106,33 +171,25 @@ def _scroll_side_panel_to_end(driver, st: Settings) -> Dict[str, Any]:
     }
 
     t0 = time.time()
-    meta["items_before"] = _js_int(driver, f"return document.querySelectorAll({st.SELENIUM_LIST_ITEM_CSS!r}).length;")
-    scroll_el_js = _find_scrollable_container_js(st.SELENIUM_LIST_ITEM_CSS)
+    # замер + прокрутка одним round-trip к браузеру (раньше — 4-5 execute_script на шаг)
+    # первый шаг ищет контейнер заново (кеш мог остаться от прошлой выдачи), дальше — из кеша
+    first_js = _scroll_state_js(st, _find_scrollable_container_js(st.SELENIUM_LIST_ITEM_CSS, reset=True))
+    step_js = _scroll_state_js(st, _find_scrollable_container_js(st.SELENIUM_LIST_ITEM_CSS))
+
+    cnt, h, end = _js_scroll_state(driver, first_js)
+    meta["items_before"] = cnt
 
     stable = 0
-    last_count = meta["items_before"]
-    last_height = _js_int(driver, "return document.body ? document.body.scrollHeight : 0;")
+    last_count = cnt
+    last_height = h
 
-    while time.time() - t0 < float(st.SELENIUM_SCROLL_MAX_SEC):
+    while not end and time.time() - t0 < float(st.SELENIUM_SCROLL_MAX_SEC):
         meta["loops"] += 1
 
-        # “конец списка” (маркер как в offline_html эвристике)
-        if _js_bool(driver, f"return !!document.querySelector({st.SELENIUM_END_MARKER_CSS!r});"):
-            meta["end_marker_found"] = True
-            break
-
-        # скроллим контейнер в самый низ
-        driver.execute_script(
-            f"""
-            const el = {scroll_el_js};
-            if (el) el.scrollTop = el.scrollHeight;
-            """
-        )
-
         time.sleep(float(st.SELENIUM_SCROLL_STEP_SEC))
 
-        cnt = _js_int(driver, f"return document.querySelectorAll({st.SELENIUM_LIST_ITEM_CSS!r}).length;")
-        h = _js_int(driver, "return document.body ? document.body.scrollHeight : 0;")
+        # замер после прокрутки; если конца ещё нет — сразу следующая прокрутка
+        cnt, h, end = _js_scroll_state(driver, step_js)
 
         if cnt <= last_count and h <= last_height:
             stable += 1
@@ -146,19 +203,58 @@ def _scroll_side_panel_to_end(driver, st: Settings) -> Dict[str, Any]:
         if stable >= int(st.SELENIUM_SCROLL_STABLE_ROUNDS):
             break
 
-    meta["items_after"] = _js_int(driver, f"return document.querySelectorAll({st.SELENIUM_LIST_ITEM_CSS!r}).length;")
+    cnt_after, _h, end_after = _js_scroll_state(driver, _scroll_state_js(st, None))
+    meta["items_after"] = cnt_after
     meta["elapsed_sec"] = round(time.time() - t0, 3)
-    meta["end_marker_found"] = bool(
-        meta["end_marker_found"]
-        or _js_bool(driver, f"return !!document.querySelector({st.SELENIUM_END_MARKER_CSS!r});")
-    )
+    meta["end_marker_found"] = bool(end or end_after)
     return meta
 
 
-def collect_companies_from_selenium_live_maps(st: Settings) -> Tuple[List[Company], Dict[str, Any], str]:
+def _side_panel_parts_js(st: Settings) -> str:
+    """
+    Части карточек выдачи прямо из DOM (формат — offline_html.side_panel_items_from_parts)
+    и маркер конца как в offline_html_is_scrolled_to_end: без page_source и разбора HTML.
+    Строки для JS — через json.dumps: repr() дал бы кавычки, ломающие селекторы с '...'.
+    """
+    item_css = json.dumps(st.SELENIUM_LIST_ITEM_CSS)
+    classed_css = json.dumps(f'[class*="{_CLASS_PREFILTER}"]')
+    return f"""
+    const skip = {{SCRIPT: 1, STYLE: 1, TEMPLATE: 1}};
+    const texts = (el) => {{
+      const out = [];
+      const w = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+      for (let t = w.nextNode(); t; t = w.nextNode()) {{
+        if (!skip[t.parentNode.nodeName]) out.push(t.nodeValue);
+      }}
+      return out;
+    }};
+    const parts = [];
+    for (const n of document.querySelectorAll({item_css})) {{
+      const a = n.querySelector('a.link-overlay[href]');
+      const classed = [];
+      for (const el of n.querySelectorAll({classed_css})) {{
+        classed.push([el.getAttribute('class'), texts(el)]);
+      }}
+      parts.push([
+        n.getAttribute('data-id'), n.getAttribute('data-coordinates'),
+        a ? a.getAttribute('href') : '', classed,
+      ]);
+    }}
+    return [parts, !!document.querySelector('[class="add-business-view"]')];
+    """
+
+
+def collect_companies_from_selenium_live_maps(
+    st: Settings, pool: Optional[SeleniumPool] = None
+) -> Tuple[List[Company], Dict[str, Any], str]:
+    """
+    pool: общий SeleniumPool прогона (его же потом использует WEB-enrich).
+    Если не передан — создаётся свой.
+    """
     request_meta: Dict[str, Any] = {"mode": "SELENIUM", "start_url": st.SELENIUM_START_URL}
 
-    pool = SeleniumPool(st, keep_chrome_open=bool(st.SELENIUM_KEEP_CHROME_OPEN))
+    if pool is None:
+        pool = SeleniumPool(st, keep_chrome_open=bool(st.SELENIUM_KEEP_CHROME_OPEN))
     pool.ensure()
 
     assert pool.driver is not None
@@ -170,9 +266,7 @@ def collect_companies_from_selenium_live_maps(st: Settings) -> Tuple[List[Compan
 
         if selenium_is_blocked(driver):
             log(f"[SELENIUM] challenge on {safe_str(driver.current_url)}")
-            _safe_input("[SELENIUM] Решите проверку в окне Chrome и нажмите Enter...")
-            time.sleep(1.0)
-            if selenium_is_blocked(driver):
+            if not wait_challenge_solved(driver, st):
                 return [], {**request_meta, "error": "challenge_still_present"}, "challenge_still_present"
 
         if st.SELENIUM_WAIT_FOR_ENTER:
@@ -187,8 +281,11 @@ def collect_companies_from_selenium_live_maps(st: Settings) -> Tuple[List[Compan
         else:
             request_meta["scroll"] = {"enabled": False}
 
-        html = driver.page_source or ""
-        companies, parse_meta = build_companies_from_offline_html(html, source_name="SELENIUM_LIVE")
+        # карточки разбираем в браузере: без сериализации page_source (мегабайты HTML) и bs4/lexbor
+        parts, scrolled_to_end = cdp_eval_script(driver, _side_panel_parts_js(st))
+        companies, parse_meta = build_companies_from_side_panel_parts(
+            parts or [], bool(scrolled_to_end), source_name="SELENIUM_LIVE"
+        )
         request_meta["parse"] = parse_meta
         request_meta["rows_initial"] = len(companies)
 
@@ -3,27 +3,33 @@
 from __future__ import annotations
 
 import subprocess
+import threading
 import time
 from pathlib import Path
-from typing import Optional
-
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
 from .config import Settings
 from .utils import log, safe_str
 
+# selenium импортируется лениво (в момент первого подключения к Chrome):
+# прогоны без Selenium-fallback не платят за его импорт.
+if TYPE_CHECKING:
+    import requests
+    from selenium import webdriver
+
 
 def _debug_port_url(st: Settings, path: str) -> str:
     return f"http://{st.DEBUG_HOST}:{st.DEBUG_PORT}{path}"
 
 
-def is_debug_chrome_alive(st: Settings, timeout_sec: float = 0.8) -> bool:
+def is_debug_chrome_alive(st: Settings, timeout_sec: float = 0.8, session: Optional[requests.Session] = None) -> bool:
+    """
+    session: для серии проверок (wait_debug_chrome) — keep-alive вместо нового соединения на каждую.
+    """
+    import requests
+
     try:
-        r = requests.get(_debug_port_url(st, "/json/version"), timeout=timeout_sec)
+        r = (session or requests).get(_debug_port_url(st, "/json/version"), timeout=timeout_sec)
         return r.status_code == 200
     except Exception:
         return False
@@ -43,37 +49,109 @@ def start_debug_chrome(st: Settings) -> subprocess.Popen:
         f"--user-data-dir={st.CHROME_PROFILE_DIR}",
         "--no-first-run",
         "--no-default-browser-check",
-        "about:blank",
     ]
+    if st.SELENIUM_DISABLE_IMAGES:
+        # Меньше сети и отрисовки при прокрутке выдачи: без картинок, перевода,
+        # фоновых запросов и притормаживания фоновых вкладок
+        args += [
+            "--blink-settings=imagesEnabled=false",
+            "--disable-features=Translate,BackForwardCache,AcceptCHFrame",
+            "--disable-background-networking",
+            "--disable-renderer-backgrounding",
+        ]
+    args.append("about:blank")
 
     log(f"[CHROME] starting: {' '.join(args)}")
     return subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=False)
 
 
+# Пауза между проверками запуска Chrome: 25мс, 50мс, 100мс, дальше не реже 200мс
+_WAIT_CHROME_FIRST_SEC = 0.025
+_WAIT_CHROME_MAX_SEC = 0.2
+
+
 def wait_debug_chrome(st: Settings) -> bool:
+    import requests
+
     t0 = time.time()
-    while time.time() - t0 < st.CHROME_START_TIMEOUT_SEC:
-        if is_debug_chrome_alive(st, timeout_sec=0.8):
-            return True
-        time.sleep(0.2)
+    delay = _WAIT_CHROME_FIRST_SEC
+    with requests.Session() as session:
+        while time.time() - t0 < st.CHROME_START_TIMEOUT_SEC:
+            if is_debug_chrome_alive(st, timeout_sec=0.8, session=session):
+                return True
+            time.sleep(delay)
+            delay = min(delay * 2, _WAIT_CHROME_MAX_SEC)
     return False
 
 
+def cdp_eval_script(driver, script: str) -> Any:
+    """
+    Выполняет тело JS-функции (с return) через CDP Runtime.evaluate (returnByValue):
+    без обёртки WebDriver execute_script и сериализации аргументов/элементов.
+    Драйвер без CDP (не Chromium) — обычный execute_script.
+    """
+    execute_cdp_cmd = getattr(driver, "execute_cdp_cmd", None)
+    if execute_cdp_cmd is None:
+        return driver.execute_script(script)
+
+    res = execute_cdp_cmd(
+        "Runtime.evaluate",
+        {"expression": f"(function() {{{script}}})()", "returnByValue": True},
+    )
+    if res.get("exceptionDetails"):
+        raise RuntimeError(f"Runtime.evaluate: {safe_str(res['exceptionDetails'].get('text'))}")
+    return (res.get("result") or {}).get("value")
+
+
+# Признаки капчи одним скриптом (URL, форма/iframe капчи, текст страницы):
+# один round-trip к браузеру вместо current_url + find_elements x2 + body.text
+_BLOCKED_JS = """
+const u = (location.href || '').toLowerCase();
+if (u.indexOf('showcaptcha') >= 0) return true;
+if (document.querySelector("form[action*='showcaptcha'], iframe[src*='captcha'], iframe[src*='showcaptcha']")) return true;
+const body = document.body ? (document.body.innerText || '').toLowerCase() : '';
+return body.indexOf('подтвердите, что запросы отправляли вы') >= 0;
+"""
+
+
 def selenium_is_blocked(driver: webdriver.Chrome) -> bool:
-    u = (driver.current_url or "").lower()
-    if "showcaptcha" in u:
-        return True
     try:
-        if driver.find_elements(By.CSS_SELECTOR, "form[action*='showcaptcha']"):
-            return True
-        if driver.find_elements(By.CSS_SELECTOR, "iframe[src*='captcha'], iframe[src*='showcaptcha']"):
-            return True
-        body_text = (driver.find_element(By.TAG_NAME, "body").text or "").lower()
-        if "подтвердите, что запросы отправляли вы" in body_text:
-            return True
+        return bool(cdp_eval_script(driver, _BLOCKED_JS))
     except Exception:
         return False
-    return False
+
+
+# Период проверки "капча решена?" в wait_challenge_solved
+_CHALLENGE_POLL_SEC = 1.0
+
+
+def wait_challenge_solved(driver: webdriver.Chrome, st: Settings) -> bool:
+    """
+    Ждёт (до SELENIUM_CHALLENGE_TIMEOUT_SEC), пока пользователь пройдёт капчу в окне Chrome:
+    опрашивает selenium_is_blocked и продолжает сам, без Enter в консоли. True — капчи больше нет.
+    """
+    log("[SELENIUM] Решите проверку в окне Chrome — продолжим автоматически...")
+    deadline = time.time() + float(st.SELENIUM_CHALLENGE_TIMEOUT_SEC)
+    while selenium_is_blocked(driver):
+        if time.time() >= deadline:
+            return False
+        time.sleep(_CHALLENGE_POLL_SEC)
+    return True
+
+
+# Блок контактов на странице организации — признак, что она дорисовалась
+_CONTACTS_CSS = '[itemprop="telephone"], a[itemprop="url"], .orgpage-phones-view'
+
+# Состояние страницы за один опрос: {blocked: true} (капча), {html: ...} (контакты есть —
+# сразу и HTML, без отдельного page_source), null — ждём дальше
+_PAGE_STATE_JS = f"""
+if ((function() {{{_BLOCKED_JS}}})()) return {{blocked: true}};
+if (!document.querySelector({_CONTACTS_CSS!r})) return null;
+return {{html: document.documentElement.outerHTML}};
+"""
+
+# Период опроса WebDriverWait (по умолчанию 0.5 сек)
+_PAGE_POLL_SEC = 0.1
 
 
 class SeleniumPool:
@@ -82,7 +160,11 @@ class SeleniumPool:
     - поднимает Chrome с remote debugging (или аттачится к существующему);
     - умеет вручную “переждать” капчу;
     - отдаёт page_source после ожидания блока контактов;
+    - страницы открывает в одной рабочей вкладке, которую переиспользует (а не новую на каждый URL);
     - в режиме keep_chrome_open=True не закрывает Chrome (для MODE=SELENIUM).
+
+    Один экземпляр живёт весь прогон (live-сбор + WEB-enrich) и держит один driver;
+    обращения к driver из разных потоков сериализуются через lock.
     """
 
     def __init__(self, st: Settings, *, keep_chrome_open: bool = False):
@@ -92,8 +174,15 @@ class SeleniumPool:
         self.proc: Optional[subprocess.Popen] = None
         self.started_by_us: bool = False
         self.driver: Optional[webdriver.Chrome] = None
+        self._lock = threading.RLock()
+        # handle рабочей вкладки (SELENIUM_OPEN_URL_IN_NEW_TAB): живёт до close()
+        self._work_handle: Optional[str] = None
 
     def ensure(self) -> None:
+        with self._lock:
+            self._ensure_locked()
+
+    def _ensure_locked(self) -> None:
         if self.driver:
             return
 
@@ -108,6 +197,9 @@ class SeleniumPool:
                 self.close()
                 raise RuntimeError(f"debug chrome did not become ready on port {self.st.DEBUG_PORT}")
 
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+
         opt = ChromeOptions()
         if self.st.SELENIUM_HEADLESS:
             opt.add_argument("--headless=new")
@@ -115,14 +207,54 @@ class SeleniumPool:
         opt.add_experimental_option("debuggerAddress", f"{self.st.DEBUG_HOST}:{self.st.DEBUG_PORT}")
         self.driver = webdriver.Chrome(options=opt)
 
-    def _safe_input(self, prompt: str) -> None:
+    def _wait_page_state(self, d) -> Dict[str, Any]:
+        """
+        Ждёт (до SELENIUM_WAIT_CONTACTS_SEC) капчу или блок контактов — что появится раньше:
+        {"blocked": True} или {"html": ...}. Таймаут/ошибка драйвера -> {}.
+        """
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        try:
+            return WebDriverWait(d, int(self.st.SELENIUM_WAIT_CONTACTS_SEC), poll_frequency=_PAGE_POLL_SEC).until(
+                lambda x: cdp_eval_script(x, _PAGE_STATE_JS)
+            )
+        except Exception:
+            return {}
+
+    def _switch_to_work_tab(self, d) -> bool:
+        """
+        Переключается в рабочую вкладку; если её нет (первый вызов или закрыта) — открывает.
+        """
+        if self._work_handle:
+            try:
+                d.switch_to.window(self._work_handle)
+                return True
+            except Exception:
+                self._work_handle = None
+        try:
+            d.switch_to.new_window("tab")  # создать и переключиться — одна команда, без sleep
+            self._work_handle = d.current_window_handle
+            return True
+        except Exception:
+            return False
+
+    def _close_work_tab(self) -> None:
+        d, handle = self.driver, self._work_handle
+        self._work_handle = None
+        if d is None or not handle:
+            return
         try:
-            input(prompt)
-        except EOFError:
-            log("[SELENIUM][WARN] input() -> EOFError (нет stdin). Продолжаем без ожидания Enter.")
+            d.switch_to.window(handle)
+            d.close()
+        except Exception:
+            pass
 
     def get_page_html(self, url: str) -> str:
-        self.ensure()
+        with self._lock:
+            return self._get_page_html_locked(url)
+
+    def _get_page_html_locked(self, url: str) -> str:
+        self._ensure_locked()
         assert self.driver is not None
         d = self.driver
 
@@ -132,44 +264,26 @@ class SeleniumPool:
         except Exception:
             original_handle = None
 
-        opened_new_tab = False
-        if self.st.SELENIUM_OPEN_URL_IN_NEW_TAB:
-            try:
-                d.execute_script("window.open('about:blank', '_blank');")
-                time.sleep(0.2)
-                d.switch_to.window(d.window_handles[-1])
-                opened_new_tab = True
-            except Exception:
-                opened_new_tab = False
+        in_work_tab = bool(self.st.SELENIUM_OPEN_URL_IN_NEW_TAB) and self._switch_to_work_tab(d)
 
         d.get(url)
-        time.sleep(float(self.st.SELENIUM_PAGE_WAIT_SEC))
 
-        if selenium_is_blocked(d):
+        # без фиксированной паузы: капча и контакты проверяются в одном цикле опроса
+        state = self._wait_page_state(d)
+        if state.get("blocked"):
             log(f"[SELENIUM] challenge for url={d.current_url}")
-            self._safe_input("[SELENIUM] Решите проверку в окне Chrome и нажмите Enter...")
-            time.sleep(1.0)
-            if selenium_is_blocked(d):
+            if not wait_challenge_solved(d, self.st):
                 raise RuntimeError(f"Challenge still present: {d.current_url}")
+            state = self._wait_page_state(d)
 
-        try:
-            WebDriverWait(d, int(self.st.SELENIUM_WAIT_CONTACTS_SEC)).until(
-                lambda x: x.find_elements(
-                    By.CSS_SELECTOR,
-                    '[itemprop="telephone"], a[itemprop="url"], .orgpage-phones-view',
-                )
-            )
-        except Exception:
-            pass
-
-        html = d.page_source or ""
+        # HTML приходит вместе с последним опросом; page_source — только если контакты не дождались
+        html = state.get("html")
+        if html is None:
+            html = d.page_source or ""
 
-        # Возврат обратно, чтобы не ломать вкладку Я.Карт
-        if opened_new_tab and self.st.SELENIUM_RETURN_TO_ORIGINAL_TAB and original_handle:
-            try:
-                d.close()
-            except Exception:
-                pass
+        # Возврат обратно, чтобы не ломать вкладку Я.Карт (рабочая вкладка остаётся до close())
+        back = in_work_tab and self.st.SELENIUM_RETURN_TO_ORIGINAL_TAB and original_handle
+        if back and original_handle != self._work_handle:
             try:
                 d.switch_to.window(original_handle)
             except Exception:
@@ -178,6 +292,8 @@ class SeleniumPool:
         return html
 
     def close(self) -> None:
+        self._close_work_tab()
+
         # В SELENIUM режиме Chrome не закрываем (пользователь закрывает сам)
         if self.keep_chrome_open:
             self.driver = None
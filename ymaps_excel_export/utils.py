@@ -1,17 +1,39 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import functools
 import json
 import math
 import os
 import re
+import threading
+import time
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+try:  # опционально: orjson заметно быстрее stdlib json
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 ANSI_YELLOW = "\033[33m"
 ANSI_RESET = "\033[0m"
 
+# Удаление "не-цифр" одним проходом str.translate: Latin-1 + кириллица ("598 оценок")
+# + General Punctuation (пробелы, NBSP, скобки, тире). Экзотика добивается посимвольным фильтром.
+_NON_ISDIGIT_TABLE = str.maketrans(
+    "",
+    "",
+    "".join(
+        chr(i)
+        for i in (*range(0x100), *range(0x400, 0x530), *range(0x2000, 0x2070))
+        if not chr(i).isdigit()
+    ),
+)
+# ASCII-строки (частый случай) чистим bytes.translate: в ~2 раза быстрее str.translate по словарю
+_ASCII_NON_DIGITS = bytes(i for i in range(0x80) if not chr(i).isdigit())
+
 
 def log(msg: str) -> None:
     print(msg, flush=True)
@@ -26,30 +48,53 @@ def now_iso_local() -> str:
 
 
 def safe_str(x: Any) -> str:
+    # str — самый частый случай (атрибуты/тексты HTML, поля JSON): проверяем первым
+    if type(x) is str:
+        return x.strip()
     if x is None:
         return ""
-    if isinstance(x, str):
-        return x.strip()
     return str(x).strip()
 
 
 def json_dumps_safe(obj: Any) -> str:
+    if orjson is not None:
+        try:
+            # OPT_NON_STR_KEYS: int/float-ключи -> строки, как в stdlib json
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except Exception:
+            pass  # например, int > 64 бит — пусть разберётся stdlib
     try:
         return json.dumps(obj, ensure_ascii=False)
     except Exception:
         return "{}"
 
 
+def json_loads(s: Union[str, bytes]) -> Any:
+    """
+    json.loads через orjson (если установлен). Ошибки — ValueError, как у stdlib.
+    bytes (например, тело ответа) принимают оба — декодировать в str заранее не нужно.
+    """
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+def digits_only(s: Any) -> str:
+    """
+    Только цифры из строки (как фильтр по str.isdigit, но в C через translate).
+    """
+    s = safe_str(s)
+    if s.isascii():
+        return s.encode("ascii").translate(None, _ASCII_NON_DIGITS).decode("ascii")
+    d = s.translate(_NON_ISDIGIT_TABLE)
+    if d and not d.isdigit():
+        d = "".join(ch for ch in d if ch.isdigit())
+    return d
+
+
 def dedup_keep_order(items: Iterable[str]) -> List[str]:
-    seen = set()
-    out: List[str] = []
-    for x in items:
-        x = safe_str(x)
-        if not x or x in seen:
-            continue
-        seen.add(x)
-        out.append(x)
-    return out
+    # dict.fromkeys: уникальность с сохранением порядка в C; пустые строки отбрасываем после
+    return [x for x in dict.fromkeys(map(safe_str, items)) if x]
 
 
 def pick_n(items: List[str], n: int) -> List[str]:
@@ -63,8 +108,13 @@ def safe_join(items: Iterable[str], sep: str = ", ") -> str:
     return sep.join(dedup_keep_order(items))
 
 
+_RE_OID = re.compile(r"[?&]oid=(\d+)")
+
+
 def oid_from_uri(uri: str) -> str:
-    m = re.search(r"[?&]oid=(\d+)", safe_str(uri))
+    # скомпилированный паттерн: без поиска в кеше re на каждый вызов; по скорости не уступает
+    # разбору через str.partition/find, но сохраняет семантику ("?oid=&oid=5", "oid=12abc")
+    m = _RE_OID.search(safe_str(uri))
     return m.group(1) if m else ""
 
 
@@ -79,9 +129,13 @@ def apply_field(dst: Dict[str, Any], key: str, value: str, *, overwrite: bool) -
     return True
 
 
+@functools.lru_cache(maxsize=4096)
 def bbox_from_center_diameter_km(center_lon: float, center_lat: float, diameter_km: float) -> str:
     """
     bbox формата: "lon1,lat1~lon2,lat2"
+
+    Результат кешируется по точным аргументам (без округления): повторные центры
+    (например, сетка поиска) не пересчитывают cos/radians.
     """
     if diameter_km <= 0:
         raise ValueError("DIAMETER_KM must be > 0")
@@ -100,26 +154,62 @@ def bbox_from_center_diameter_km(center_lon: float, center_lat: float, diameter_
     lat1 = max(-90.0, min(90.0, center_lat - dlat))
     lat2 = max(-90.0, min(90.0, center_lat + dlat))
 
-    return f"{lon1:.6f},{lat1:.6f}~{lon2:.6f},{lat2:.6f}"
+    return "%.6f,%.6f~%.6f,%.6f" % (lon1, lat1, lon2, lat2)
 
 
-def env_str(name: str, default: str = "") -> str:
-    v = os.getenv(name)
+def available_cpus() -> int:
+    # Учитываем CPU-affinity (контейнеры, taskset): os.cpu_count() видит все ядра хоста
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except (AttributeError, OSError):  # Windows/macOS
+        return os.cpu_count() or 1
+
+
+class RateLimiter:
+    """
+    Не чаще одного acquire() в interval_sec — общий лимит на все потоки
+    (token bucket ёмкостью 1). Ждёт только тот, кто действительно превышает темп:
+    если с прошлого запроса прошло больше interval_sec, acquire() возвращается сразу.
+    """
+
+    def __init__(self, interval_sec: float):
+        self.interval_sec = max(0.0, float(interval_sec))
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.interval_sec <= 0:
+            return
+        # слот занимаем под lock, ждём — без него (другие потоки сразу получают следующие слоты)
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next_at)
+            self._next_at = at + self.interval_sec
+        if at > now:
+            time.sleep(at - now)
+
+
+def env_str(name: str, default: str = "", env: Optional[Mapping[str, str]] = None) -> str:
+    """
+    env: снимок окружения (dict) — чтобы при массовом чтении не ходить в os.environ
+    на каждый параметр. None -> os.environ.
+    """
+    v = (os.environ if env is None else env).get(name)
     return safe_str(v) if v is not None else safe_str(default)
 
 
-def env_int(name: str, default: int) -> int:
-    v = env_str(name, "")
+def env_int(name: str, default: int, env: Optional[Mapping[str, str]] = None) -> int:
+    v = env_str(name, "", env)
     return int(v) if v else default
 
 
-def env_float(name: str, default: float) -> float:
-    v = env_str(name, "")
+def env_float(name: str, default: float, env: Optional[Mapping[str, str]] = None) -> float:
+    v = env_str(name, "", env)
     return float(v) if v else default
 
 
-def env_bool01(name: str, default: bool) -> bool:
-    v = env_str(name, "")
+def env_bool01(name: str, default: bool, env: Optional[Mapping[str, str]] = None) -> bool:
+    v = env_str(name, "", env)
     if not v:
         return default
     v = v.lower()
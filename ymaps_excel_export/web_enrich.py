@@ -2,40 +2,85 @@
 
 from __future__ import annotations
 
-import json
+import functools
 import re
-import time
-from typing import Any, Dict, List, Tuple
-
-import requests
-from bs4 import BeautifulSoup
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Callable, Collection, Dict, Iterator, List, Optional, Tuple
 
 from .config import Settings
 from .models import Company
 from .selenium_pool import SeleniumPool
-from .utils import dedup_keep_order, json_dumps_safe, log, pick_n, safe_str
+from .utils import RateLimiter, available_cpus, dedup_keep_order, digits_only, json_dumps_safe, json_loads, log, pick_n, safe_str
+
+# requests импортируется лениво (≈50 мс): нужен только при WEB-enrich
+if TYPE_CHECKING:
+    import requests
 
 _PHONE_RE = re.compile(r"\+?\d[\d\s().-]{6,}\d")
 
-_RE_RATING_VALUE = re.compile(r'"ratingValue"\s*:\s*"?([0-9]+(?:[.,][0-9]+)?)"?', re.I)
-_RE_REVIEW_COUNT = re.compile(r'"reviewCount"\s*:\s*"?(\d{1,10})"?', re.I)
-_RE_REVIEWS_ALT = re.compile(r'"reviewsCount"\s*:\s*"?(\d{1,10})"?', re.I)
+# Regex-fallback рейтинга/оценок/отзывов: все ключи одним проходом по html.
+# Группа названа по ключу; m.lastgroup — какой ключ совпал.
+_RE_RATING_FIELDS = re.compile(
+    r'"(?:'
+    r'ratingValue"\s*:\s*"?(?P<ratingValue>[0-9]+(?:[.,][0-9]+)?)'
+    r'|rating"\s*:\s*"?(?P<rating>[0-9]+(?:[.,][0-9]+)?)'
+    r'|ratingCount"\s*:\s*"?(?P<ratingCount>\d{1,10})'     # НОВОЕ: кол-во оценок
+    r'|ratingsCount"\s*:\s*"?(?P<ratingsCount>\d{1,10})'
+    r'|reviewCount"\s*:\s*"?(?P<reviewCount>\d{1,10})'
+    r'|reviewsCount"\s*:\s*"?(?P<reviewsCount>\d{1,10})'
+    r')"?',
+    re.I,
+)
+
+# "Hours"/"hours" — один паттерн (re.I), один проход по html
+_RE_HOURS_TEXT = re.compile(r'"hours"\s*:\s*\{[^{}]*"text"\s*:\s*"([^"]{3,200})"', re.I)
+
+_RE_JSONLD_SCRIPT = re.compile(
+    r"<script[^>]+type=['\"]application/ld\+json['\"][^>]*>(.*?)</script>", re.DOTALL | re.IGNORECASE
+)
+_RE_EMBED_JSON_SCRIPT = re.compile(
+    r"<script[^>]+type=['\"]application/json['\"][^>]*>(.*?)</script>", re.DOTALL | re.IGNORECASE
+)
+_RE_WINDOW_STATE = re.compile(r"window\.__[A-Z0-9_]{3,}\s*=\s*({.*?})\s*;\s*", re.DOTALL)
+
+
+@functools.cache
+def _soup_features() -> str:
+    """
+    lxml (C, есть в requirements.txt) разбирает HTML в разы быстрее html.parser;
+    html.parser — запасной вариант для окружений без lxml.
+    """
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return "html.parser"
+    return "lxml"
 
-# НОВОЕ: кол-во оценок (ratingCount / ratingsCount)
-_RE_RATING_COUNT = re.compile(r'"ratingCount"\s*:\s*"?(\d{1,10})"?', re.I)
-_RE_RATINGS_COUNT_ALT = re.compile(r'"ratingsCount"\s*:\s*"?(\d{1,10})"?', re.I)
 
-_RE_RATING_ALT = re.compile(r'"rating"\s*:\s*"?([0-9]+(?:[.,][0-9]+)?)"?', re.I)
+@functools.lru_cache(maxsize=1)
+def _soup(html: str):
+    """
+    Дерево страницы. parse_web_contacts_fast / parse_counts_from_dom / parse_worktime_from_html /
+    requests_is_blocked получают одну и ту же строку html, поэтому страница разбирается один раз
+    (кеш на последнюю страницу). Дерево общее — вызывающие его не меняют.
+    """
+    # bs4 импортируется лениво: нужен только при WEB-enrich
+    from bs4 import BeautifulSoup
 
-_RE_HOURS_TEXT_1 = re.compile(r'"Hours"\s*:\s*\{[^{}]*"text"\s*:\s*"([^"]{3,200})"', re.I)
-_RE_HOURS_TEXT_2 = re.compile(r'"hours"\s*:\s*\{[^{}]*"text"\s*:\s*"([^"]{3,200})"', re.I)
+    return BeautifulSoup(html or "", _soup_features())
 
 
 def normalize_phone_ru(s: str) -> str:
     s = safe_str(s)
     if not s:
         return ""
-    digits = re.sub(r"\D+", "", s)
+    # короче 10 символов нормализовывать нечего
+    if len(s) < 10:
+        return s
+    # уже канонический +7XXXXXXXXXX (частый случай: href="tel:+7...") — результат совпал бы с s
+    if len(s) == 12 and s.startswith("+7") and s.isascii() and s[1:].isdigit():
+        return s
+    digits = digits_only(s)
     if len(digits) == 11 and digits.startswith("8"):
         digits = "7" + digits[1:]
     if len(digits) == 10:
@@ -56,78 +101,140 @@ def _format_rating_1(x: Any) -> str:
     return f"{v:.1f}".replace(".", ",")
 
 
-def _digits(s: str) -> str:
-    s = safe_str(s)
-    return "".join(ch for ch in s if ch.isdigit())
+def _has_any(s: str, needles: Collection[str]) -> bool:
+    return not needles or any(n in s for n in needles)
 
 
-def extract_jsonld_blocks(html: str) -> List[Any]:
-    blocks = re.findall(
-        r"<script[^>]+type=['\"]application/ld\+json['\"][^>]*>(.*?)</script>",
-        html or "",
-        flags=re.DOTALL | re.IGNORECASE,
-    )
+def extract_jsonld_blocks(html: str, needles: Collection[str] = ()) -> List[Any]:
+    """
+    needles: блоки без единой из подстрок не разбираются (json_loads — самое дорогое здесь).
+    """
+    blocks = _RE_JSONLD_SCRIPT.findall(html or "")
     out: List[Any] = []
     for b in blocks:
         b = (b or "").strip()
-        if not b:
+        if not b or not _has_any(b, needles):
             continue
         try:
-            out.append(json.loads(b))
+            out.append(json_loads(b))
         except Exception:
             continue
     return out
 
 
-def extract_embedded_json_objects(html: str) -> List[Any]:
+def extract_embedded_json_objects(html: str, needles: Collection[str] = ()) -> List[Any]:
     """
     Часто у Яндекса встречаются <script type="application/json">...</script>
     и/или window.__SOME_STATE__ = {...}
+    needles — как в extract_jsonld_blocks.
     """
     out: List[Any] = []
 
-    for b in re.findall(
-        r"<script[^>]+type=['\"]application/json['\"][^>]*>(.*?)</script>",
-        html or "",
-        flags=re.DOTALL | re.IGNORECASE,
-    ):
+    for b in _RE_EMBED_JSON_SCRIPT.findall(html or ""):
         b = (b or "").strip()
-        if not b:
+        if not b or not _has_any(b, needles):
             continue
         try:
-            out.append(json.loads(b))
+            out.append(json_loads(b))
         except Exception:
             continue
 
-    for b in re.findall(
-        r"window\.__[A-Z0-9_]{3,}\s*=\s*({.*?})\s*;\s*",
-        html or "",
-        flags=re.DOTALL,
-    ):
+    for b in _RE_WINDOW_STATE.findall(html or ""):
         b = (b or "").strip()
-        if not b:
+        if not b or not _has_any(b, needles):
             continue
         try:
-            out.append(json.loads(b))
+            out.append(json_loads(b))
         except Exception:
             continue
 
     return out
 
 
-def walk_find(obj: Any, key: str) -> List[Any]:
-    found: List[Any] = []
-    if isinstance(obj, dict):
-        for k, v in obj.items():
-            if k == key:
-                found.append(v)
-            found.extend(walk_find(v, key))
-    elif isinstance(obj, list):
-        for it in obj:
-            found.extend(walk_find(it, key))
+_JSON_CONTAINERS = (dict, list)
+
+
+def iter_walk_find(obj: Any, keys: Collection[str]) -> Iterator[Tuple[str, Any]]:
+    """
+    Лениво (без рекурсии) отдаёт (key, value) для ключей из keys на любой глубине obj:
+    ключ, затем его поддерево, затем следующий ключ. Вызывающий может прервать обход.
+    """
+    # элементы стека: (True, key, value) — совпавший ключ, (False, None, node) — dict/list для обхода.
+    # Скаляры (большая часть узлов JSON) в стек не кладём: искать в них нечего.
+    stack: List[Tuple[bool, Any, Any]] = [(False, None, obj)]
+    while stack:
+        hit, key, o = stack.pop()
+        if hit:
+            yield key, o
+        elif isinstance(o, dict):
+            for k, v in reversed(o.items()):
+                if isinstance(v, _JSON_CONTAINERS):
+                    stack.append((False, None, v))
+                if k in keys:
+                    stack.append((True, k, v))
+        elif isinstance(o, list):
+            stack.extend((False, None, it) for it in reversed(o) if isinstance(it, _JSON_CONTAINERS))
+
+
+def walk_find_many(obj: Any, keys: Collection[str]) -> Dict[str, List[Any]]:
+    """
+    Один обход obj: key -> все значения по этому ключу, в порядке iter_walk_find.
+    """
+    found: Dict[str, List[Any]] = {}
+    for key, v in iter_walk_find(obj, keys):
+        found.setdefault(key, []).append(v)
     return found
 
 
+def walk_find(obj: Any, key: str) -> List[Any]:
+    return [v for _k, v in iter_walk_find(obj, (key,))]
+
+
+def walk_find_first(obj: Any, key: str, default: Any = None) -> Any:
+    # обход останавливается на первом совпадении
+    for _k, v in iter_walk_find(obj, (key,)):
+        return v
+    return default
+
+
+# Ключи, которые parse_rating_counts_from_embedded_json ищет в каждом объекте
+_EMBEDDED_RATING_KEYS = frozenset({"ratingValue", "reviewCount", "reviewsCount", "ratingCount", "ratingsCount", "rating"})
+# Подстроки, без которых в JSON-блоке нет нужных ключей: такой блок не разбираем
+_JSONLD_RATING_NEEDLES = ('"aggregateRating"',)
+_EMBEDDED_RATING_NEEDLES = ('"rating', '"review')
+
+
+def _regex_rating_fallback(html: str, rating_value: str, rating_count: str, review_count: str) -> Tuple[str, str, str]:
+    """
+    Дозаполняет пустые поля первым совпадением в html: основной ключ, иначе запасной
+    (ratingValue/rating, ratingCount/ratingsCount, reviewCount/reviewsCount).
+    """
+    # основные ключи недостающих полей: когда все найдены, дальше html не сканируем
+    wanted = {k for k, empty in (("ratingValue", not rating_value), ("ratingCount", not rating_count),
+                                 ("reviewCount", not review_count)) if empty}
+    if not wanted:
+        return rating_value, rating_count, review_count
+
+    found: Dict[str, str] = {}
+    for m in _RE_RATING_FIELDS.finditer(html or ""):
+        found.setdefault(m.lastgroup, m.group(m.lastgroup))
+        if wanted <= found.keys():
+            break
+
+    if not rating_value:
+        v = found.get("ratingValue") or found.get("rating")
+        if v:
+            rating_value = _format_rating_1(v)
+
+    if not rating_count:
+        rating_count = safe_str(found.get("ratingCount") or found.get("ratingsCount"))
+
+    if not review_count:
+        review_count = safe_str(found.get("reviewCount") or found.get("reviewsCount"))
+
+    return rating_value, rating_count, review_count
+
+
 def parse_rating_counts_from_jsonld(html: str) -> Tuple[str, str, str]:
     """
     Возвращает:
@@ -137,8 +244,8 @@ def parse_rating_counts_from_jsonld(html: str) -> Tuple[str, str, str]:
     rating_count = ""
     review_count = ""
 
-    for o in extract_jsonld_blocks(html):
-        for agg in walk_find(o, "aggregateRating"):
+    for o in extract_jsonld_blocks(html, _JSONLD_RATING_NEEDLES):
+        for _k, agg in iter_walk_find(o, ("aggregateRating",)):
             if not isinstance(agg, dict):
                 continue
 
@@ -151,98 +258,66 @@ def parse_rating_counts_from_jsonld(html: str) -> Tuple[str, str, str]:
             if not review_count and agg.get("reviewCount") is not None:
                 review_count = safe_str(agg.get("reviewCount"))
 
+            if rating_value and rating_count and review_count:
+                return rating_value, rating_count, review_count
+
     # Regex fallback
-    if not rating_value:
-        m = _RE_RATING_VALUE.search(html or "") or _RE_RATING_ALT.search(html or "")
-        if m:
-            rating_value = _format_rating_1(m.group(1))
+    return _regex_rating_fallback(html, rating_value, rating_count, review_count)
 
-    if not rating_count:
-        m = _RE_RATING_COUNT.search(html or "") or _RE_RATINGS_COUNT_ALT.search(html or "")
-        if m:
-            rating_count = safe_str(m.group(1))
 
-    if not review_count:
-        m = _RE_REVIEW_COUNT.search(html or "") or _RE_REVIEWS_ALT.search(html or "")
-        if m:
-            review_count = safe_str(m.group(1))
+def _digits_value(v: Any) -> str:
+    s = safe_str(v)
+    return s if s.isdigit() else ""
 
-    return rating_value, rating_count, review_count
 
+def _first_valid(values: Optional[List[Any]], conv: Callable[[Any], str]) -> str:
+    # первое непустое conv(v) среди values
+    for v in values or ():
+        s = conv(v)
+        if s:
+            return s
+    return ""
 
-def parse_rating_counts_from_embedded_json(html: str) -> Tuple[str, str, str]:
+
+def parse_rating_counts_from_embedded_json(html: str, regex_fallback: bool = True) -> Tuple[str, str, str]:
     """
     Возвращает:
       rating_value, rating_count(оценки), review_count(отзывы)
+    regex_fallback=False — когда по этому html его уже прогнал parse_rating_counts_from_jsonld.
     """
     rating_value = ""
     rating_count = ""
     review_count = ""
 
-    for obj in extract_embedded_json_objects(html):
+    for obj in extract_embedded_json_objects(html, _EMBEDDED_RATING_NEEDLES):
+        # все ключи за один обход объекта; приоритет ключей — как раньше, порядок значений тот же
+        found = walk_find_many(obj, _EMBEDDED_RATING_KEYS)
+
         if not rating_value:
-            for v in walk_find(obj, "ratingValue"):
-                s = _format_rating_1(v)
-                if s:
-                    rating_value = s
-                    break
+            rating_value = _first_valid(found.get("ratingValue"), _format_rating_1)
 
         if not review_count:
-            for v in walk_find(obj, "reviewCount"):
-                s = safe_str(v)
-                if s.isdigit():
-                    review_count = s
-                    break
-
+            review_count = _first_valid(found.get("reviewCount"), _digits_value)
         if not review_count:
-            for v in walk_find(obj, "reviewsCount"):
-                s = safe_str(v)
-                if s.isdigit():
-                    review_count = s
-                    break
+            review_count = _first_valid(found.get("reviewsCount"), _digits_value)
 
         if not rating_count:
-            for v in walk_find(obj, "ratingCount"):
-                s = safe_str(v)
-                if s.isdigit():
-                    rating_count = s
-                    break
-
+            rating_count = _first_valid(found.get("ratingCount"), _digits_value)
         if not rating_count:
-            for v in walk_find(obj, "ratingsCount"):
-                s = safe_str(v)
-                if s.isdigit():
-                    rating_count = s
-                    break
+            rating_count = _first_valid(found.get("ratingsCount"), _digits_value)
 
         # иногда rating лежит просто как "rating"
         if not rating_value:
-            for v in walk_find(obj, "rating"):
-                s = _format_rating_1(v)
-                if s:
-                    rating_value = s
-                    break
+            rating_value = _first_valid(found.get("rating"), _format_rating_1)
 
         if rating_value and rating_count and review_count:
             return rating_value, rating_count, review_count
 
-    # Regex fallback (на всякий)
-    if not rating_value:
-        m = _RE_RATING_VALUE.search(html or "") or _RE_RATING_ALT.search(html or "")
-        if m:
-            rating_value = _format_rating_1(m.group(1))
-
-    if not rating_count:
-        m = _RE_RATING_COUNT.search(html or "") or _RE_RATINGS_COUNT_ALT.search(html or "")
-        if m:
-            rating_count = safe_str(m.group(1))
-
-    if not review_count:
-        m = _RE_REVIEW_COUNT.search(html or "") or _RE_REVIEWS_ALT.search(html or "")
-        if m:
-            review_count = safe_str(m.group(1))
+    if not regex_fallback:
+        return rating_value, rating_count, review_count
 
-    return rating_value, rating_count, review_count
+    # Regex fallback (на всякий)
+    return _regex_rating_fallback(html, rating_value, rating_count, review_count)
 
 
 def parse_counts_from_dom(html: str) -> Tuple[str, str]:
@@ -251,14 +326,14 @@ def parse_counts_from_dom(html: str) -> Tuple[str, str]:
       - business-rating-amount-view может содержать "XXXX оценок" и/или "YY отзывов"
       - иногда встречается "(5725)" — трактуем как оценки
     """
-    soup = BeautifulSoup(html or "", "html.parser")
+    soup = _soup(html)
 
     rating_count = ""
     review_count = ""
 
     for el in soup.find_all(True, class_=lambda c: isinstance(c, str) and "business-rating-amount-view" in c):
         t = safe_str(el.get_text(" ", strip=True)).lower()
-        d = _digits(t)
+        d = digits_only(t)
         if not d:
             continue
         if ("оцен" in t) and (not rating_count):
@@ -269,71 +344,111 @@ def parse_counts_from_dom(html: str) -> Tuple[str, str]:
     if not rating_count:
         el2 = soup.select_one(".business-rating-with-text-view__count")
         if el2:
-            d2 = _digits(el2.get_text(" ", strip=True))
+            d2 = digits_only(el2.get_text(" ", strip=True))
             if d2:
                 rating_count = d2
 
     return rating_count, review_count
 
 
+_WORKSTATUS_CLASS = "business-working-status-view"
+
+
 def parse_worktime_from_html(html: str) -> str:
-    m = _RE_HOURS_TEXT_1.search(html or "") or _RE_HOURS_TEXT_2.search(html or "")
+    m = _RE_HOURS_TEXT.search(html or "")
     if m:
         return safe_str(m.group(1))
 
-    soup = BeautifulSoup(html or "", "html.parser")
-    for sel in (
-        ".business-working-status-view__text",
-        ".business-working-status-view",
-        "[class*=business-working-status-view]",
-    ):
-        n = soup.select_one(sel)
+    if _WORKSTATUS_CLASS not in (html or ""):
+        return ""
+
+    # [class*=...] — надмножество двух классов ниже: одним проходом по дереву берём всех кандидатов,
+    # затем по приоритету (__text, сам блок, любой) — первый в документе с подходящим классом
+    nodes = _soup(html).select(f"[class*={_WORKSTATUS_CLASS}]")
+    for cls in (f"{_WORKSTATUS_CLASS}__text", _WORKSTATUS_CLASS, None):
+        n = next((x for x in nodes if cls is None or cls in (x.get("class") or ())), None)
         if n is not None:
-            t = safe_str(n.get_text(" ", strip=True))
+            t = n.get_text(" ", strip=True)
             if t and len(t) < 200:
                 return t
     return ""
 
 
-def parse_web_contacts_fast(html: str) -> Dict[str, Any]:
-    soup = BeautifulSoup(html or "", "html.parser")
-
-    # Phones
-    tels: List[str] = []
-    for a in soup.select('a[href^="tel:"]'):
-        href = safe_str(a.get("href"))
-        tel = href.replace("tel:", "").strip()
-        if tel:
-            tels.append(normalize_phone_ru(tel))
-
-    for node in soup.select('[itemprop="telephone"]'):
-        t = safe_str(node.get_text(" ", strip=True))
-        if t:
-            tels.append(normalize_phone_ru(t))
-
-    meta_desc = soup.select_one('meta[name="description"][content]')
-    if meta_desc is not None:
-        content = safe_str(meta_desc.get("content"))
-        for m in _PHONE_RE.findall(content):
-            tels.append(normalize_phone_ru(m))
-
-    # Emails
+def parse_web_contacts_fast(html: str, max_phones: int = 0) -> Dict[str, Any]:
+    """
+    max_phones > 0: meta description (запасной источник) сканируется лениво,
+    пока уникальных телефонов меньше max_phones.
+    """
+    # Подстроки-значения атрибутов из селекторов ниже: без подстроки селектор ничего не найдёт,
+    # поэтому его (а если нет ни одной — и разбор страницы) пропускаем
+    html = html or ""
+    has_tel = "tel:" in html
+    has_mail = "mailto:" in html
+    has_itemprop = "itemprop" in html
+    has_desc = "description" in html
+    if not (has_tel or has_mail or has_itemprop or has_desc):
+        return {"telephones": [], "emails": [], "site": ""}
+
+    soup = _soup(html)
+
+    # Ссылки tel:/mailto:, itemprop=telephone и itemprop=url — одним проходом по дереву
+    # (один составной селектор вместо четырёх select); раскладываем по источникам,
+    # порядок внутри источника — документный, как у отдельных select
+    has_itemprop_tel = has_itemprop and "telephone" in html
+    selectors = []
+    if has_tel:
+        selectors.append('a[href^="tel:"]')
+    if has_mail:
+        selectors.append('a[href^="mailto:"]')
+    if has_itemprop_tel:
+        selectors.append('[itemprop="telephone"]')
+    if has_itemprop:
+        selectors.append('a[itemprop="url"][href]')
+
+    link_tels: List[str] = []
+    itemprop_tels: List[str] = []
     emails: List[str] = []
-    for a in soup.select('a[href^="mailto:"]'):
-        href = safe_str(a.get("href"))
-        em = href.replace("mailto:", "").strip()
-        if em:
-            emails.append(em)
-
-    # Site
     site = ""
-    aurl = soup.select_one('a[itemprop="url"][href]')
-    if aurl is not None:
-        site = safe_str(aurl.get("href"))
+    site_found = False
+    for node in soup.select(", ".join(selectors)) if selectors else ():
+        # атрибуты bs4 — str или None, get_text(strip=True) — уже обрезанная str:
+        # safe_str на горячем пути не нужен
+        href = node.get("href")
+        is_a = node.name == "a"
+        if is_a and href is not None:
+            if href.startswith("tel:"):
+                tel = href.replace("tel:", "").strip()
+                if tel:
+                    link_tels.append(normalize_phone_ru(tel))
+            elif href.startswith("mailto:"):
+                em = href.replace("mailto:", "").strip()
+                if em:
+                    emails.append(em)
+        itemprop = node.get("itemprop")
+        if itemprop == "telephone":
+            t = node.get_text(" ", strip=True)
+            if t:
+                itemprop_tels.append(normalize_phone_ru(t))
+        elif itemprop == "url" and is_a and href is not None and not site_found:
+            site = href.strip()
+            site_found = True
+
+    # Phones
+    tels = link_tels + itemprop_tels
+
+    if has_desc and (max_phones <= 0 or len(set(tels)) < max_phones):
+        meta_desc = soup.find("meta", attrs={"name": "description", "content": True})
+        if meta_desc is not None:
+            content = meta_desc.get("content") or ""
+            for m in _PHONE_RE.finditer(content):
+                tels.append(normalize_phone_ru(m.group(0)))
+                if max_phones > 0 and len(set(tels)) >= max_phones:
+                    break
 
     return {
-        "telephones": dedup_keep_order([x for x in tels if safe_str(x)]),
-        "emails": dedup_keep_order([x for x in emails if safe_str(x)]),
+        # dedup_keep_order сам отбрасывает пустые
+        "telephones": dedup_keep_order(tels),
+        "emails": dedup_keep_order(emails),
         "site": site,
     }
 
@@ -343,20 +458,64 @@ def requests_is_blocked(final_url: str, html: str) -> bool:
     if "showcaptcha" in u:
         return True
 
-    soup = BeautifulSoup(html or "", "html.parser")
-    if soup.select_one("form[action*='showcaptcha']") is not None:
-        return True
-    if soup.select_one("iframe[src*='captcha'], iframe[src*='showcaptcha']") is not None:
-        return True
-
-    txt = safe_str(soup.get_text(" ", strip=True)).lower()
-    if "подтвердите, что запросы отправляли вы" in txt:
-        return True
+    # Дешёвый префильтр: без этих подстрок ни один из признаков ниже не сработает,
+    # поэтому чистую страницу не парсим вовсе.
+    html = html or ""
+    has_captcha = "captcha" in html
+    # фраза в тексте может быть разбита тегами ("отправляли <b>вы</b>"), поэтому проверяем
+    # только слово без первой буквы (регистр)
+    has_phrase_word = "тправляли" in html
+    if not has_captcha and not has_phrase_word:
+        return False
+
+    soup = _soup(html)
+    if has_captcha:
+        if "showcaptcha" in html and soup.select_one("form[action*='showcaptcha']") is not None:
+            return True
+        if soup.select_one("iframe[src*='captcha'], iframe[src*='showcaptcha']") is not None:
+            return True
+
+    # get_text собирает текст всей страницы — только если слово из фразы вообще есть в html
+    if has_phrase_word:
+        txt = soup.get_text(" ", strip=True).lower()
+        if "подтвердите, что запросы отправляли вы" in txt:
+            return True
 
     return False
 
 
+# Повторы запроса страницы организации (их делает urllib3 внутри сессии, см. new_web_session):
+# до 3 попыток, паузы 0.6/1.2 сек (или Retry-After), как у прежнего ручного цикла
+_WEB_RETRY_TOTAL = 2
+_WEB_RETRY_BACKOFF_SEC = 0.6
+_WEB_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def new_web_session() -> requests.Session:
+    """
+    Session для http_get_org_page: повторы при 429/5xx и сетевых ошибках — в HTTPAdapter (urllib3 Retry).
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=_WEB_RETRY_TOTAL,
+        backoff_factor=_WEB_RETRY_BACKOFF_SEC,
+        status_forcelist=_WEB_RETRY_STATUSES,
+        raise_on_status=False,  # последний ответ 429/5xx отдаём как есть -> "WEB HTTP ..."
+    )
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    return session
+
+
 def http_get_org_page(session: requests.Session, oid: str, timeout_sec: int) -> Tuple[str, str]:
+    """
+    Повторы делает сама session (new_web_session); здесь — один запрос.
+    """
+    import requests
+
     url = f"https://yandex.ru/maps/org/{oid}"
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -364,63 +523,88 @@ def http_get_org_page(session: requests.Session, oid: str, timeout_sec: int) ->
         "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
     }
 
-    last_exc: Exception | None = None
-    for attempt in range(1, 4):
-        try:
-            r = session.get(url, headers=headers, timeout=timeout_sec, allow_redirects=True)
-            html = r.text or ""
-            final_url = r.url or url
-
-            if r.status_code in (429, 500, 502, 503, 504):
-                time.sleep(0.6 * attempt)
-                continue
-
-            if r.status_code >= 400:
-                raise RuntimeError(f"WEB HTTP {r.status_code} final_url={final_url}")
-
-            return final_url, html
-
-        except (requests.Timeout, requests.ConnectionError) as e:
-            last_exc = e
-            time.sleep(0.6 * attempt)
-
-    raise RuntimeError(f"requests failed oid={oid} err={last_exc}")
-
-
-def set_if_needed(c: Company, attr: str, value: str, overwrite: bool) -> int:
-    val = safe_str(value)
-    if not val:
-        return 0
-    cur = safe_str(getattr(c, attr))
-    if cur and not overwrite:
-        return 0
-    setattr(c, attr, val)
-    return 1
-
-
-def enrich_company_from_web(st: Settings, c: Company, pool: SeleniumPool, session: requests.Session) -> Tuple[Company, Dict[str, Any]]:
-    stats: Dict[str, Any] = {"mode": "WEB"}
-
-    oid = safe_str(getattr(c, "ID", ""))
-    if not oid.isdigit():
-        stats["skipped"] = "nondigit_oid"
-        return c, stats
-
-    used_selenium = False
+    try:
+        r = session.get(url, headers=headers, timeout=timeout_sec, allow_redirects=True)
+    except (requests.Timeout, requests.ConnectionError) as e:
+        raise RuntimeError(f"requests failed oid={oid} err={e}") from e
+
+    final_url = r.url or url
+    if r.status_code >= 400:
+        raise RuntimeError(f"WEB HTTP {r.status_code} final_url={final_url}")
+
+    return final_url, r.text or ""
+
+
+# Поля, которые WEB-enrich записывает; заполненные перезаписываются только при WEB_FORCE_OVERWRITE
+_WEB_SET_ATTRS: Tuple[str, ...] = (
+    "Сайт",
+    "Телефон_1",
+    "Телефон_2",
+    "Телефон_3",
+    "Email_1",
+    "Email_2",
+    "Email_3",
+    "Рейтинг",
+    "Количество_оценок",
+    "Количество_отзывов",
+    "Режим_работы",
+)
+# Колонок Телефон_N / Email_N в _WEB_SET_ATTRS
+_WEB_CONTACT_COLS = 3
+# Режим работы НЕ перезаписываем агрессивно (обычно он уже есть из выдачи)
+_WEB_KEEP_ATTRS = frozenset({"Режим_работы"})
+# Company — slots-dataclass (без __dict__): все значения за один C-вызов
+_get_web_set_attrs = attrgetter(*_WEB_SET_ATTRS)
+
+
+@functools.cache
+def _web_needed_attrs(max_phones: int, max_emails: int) -> attrgetter:
+    """
+    Поля, ради которых при капче стоит открывать Chrome (без WEB_FORCE_OVERWRITE): рейтинг, сайт,
+    режим работы и те Телефон_N / Email_N, которые enrich вообще может заполнить (N <= MAX_*).
+    """
+    n_tel = max(0, min(max_phones, _WEB_CONTACT_COLS))
+    n_email = max(0, min(max_emails, _WEB_CONTACT_COLS))
+    return attrgetter(
+        "Рейтинг",
+        "Сайт",
+        "Режим_работы",
+        *(f"Телефон_{i}" for i in range(1, n_tel + 1)),
+        *(f"Email_{i}" for i in range(1, n_email + 1)),
+    )
 
-    final_url, html = http_get_org_page(session, oid, timeout_sec=st.WEB_TIMEOUT_SEC)
-    if requests_is_blocked(final_url, html):
-        html = pool.get_page_html(f"https://yandex.ru/maps/org/{oid}")
-        used_selenium = True
 
-    contacts = parse_web_contacts_fast(html)
+def _raw_json_append_key(raw_json: str, key: str, value: Any) -> Optional[str]:
+    """
+    Дописывает ключ в JSON-объект raw_json без полного json_loads/json_dumps
+    (raw_json бывает сотни КБ, а добавляем мы маленький trace).
+    None — если строка не похожа на объект или ключ уже есть: тогда нужен полный разбор.
+    """
+    s = raw_json.strip()
+    if not (s.startswith("{") and s.endswith("}")):
+        return None
+    quoted = json_dumps_safe(key)
+    if quoted in s:
+        return None
+    body = s[:-1].rstrip()
+    sep = "" if body == "{" else ","
+    return body + sep + quoted + ":" + json_dumps_safe(value) + "}"
+
+
+def parse_org_page(html: str, max_phones: int = 0) -> Dict[str, Any]:
+    """
+    Всё, что WEB-enrich берёт со страницы организации (контакты, рейтинг/оценки/отзывы, режим работы).
+    Не трогает Company/Selenium, аргументы и результат picklable — можно выполнять в другом процессе.
+    """
+    contacts = parse_web_contacts_fast(html, max_phones=max_phones)
 
     # 1) JSON-LD
     rating_value, rating_count, review_count = parse_rating_counts_from_jsonld(html)
 
-    # 2) embedded-json fallback
+    # 2) embedded-json fallback. Regex-fallback уже отработал в п.1: поле, оставшееся пустым,
+    # не встречается в html ни под основным, ни под запасным ключом — второй проход по html не нужен
     if not rating_value or not rating_count or not review_count:
-        r2, rc2, rv2 = parse_rating_counts_from_embedded_json(html)
+        r2, rc2, rv2 = parse_rating_counts_from_embedded_json(html, regex_fallback=False)
         rating_value = rating_value or r2
         rating_count = rating_count or rc2
         review_count = review_count or rv2
@@ -432,40 +616,94 @@ def enrich_company_from_web(st: Settings, c: Company, pool: SeleniumPool, sessio
 
     worktime = parse_worktime_from_html(html)
 
-    changed = 0
-    overwrite = bool(st.WEB_FORCE_OVERWRITE)
+    return {
+        "contacts": contacts,
+        "rating_value": rating_value,
+        "rating_count": rating_count,
+        "review_count": review_count,
+        "worktime": worktime,
+    }
+
+
+def _parse_org_page_job(page: Tuple[str, str], max_phones: int) -> Optional[Dict[str, Any]]:
+    """
+    parse_org_page для пула процессов. None — страница с капчей: её (Selenium) разбирает
+    enrich_company_from_web в основном процессе.
+    """
+    final_url, html = page
+    if requests_is_blocked(final_url, html):
+        return None
+    return parse_org_page(html, max_phones=max_phones)
+
+
+def enrich_company_from_web(
+    st: Settings,
+    c: Company,
+    pool: SeleniumPool,
+    session: Optional[requests.Session],
+    page: Optional[Tuple[str, str]] = None,
+    parsed: Optional[Dict[str, Any]] = None,
+) -> Tuple[Company, Dict[str, Any]]:
+    """
+    page: уже загруженная страница (final_url, html) — тогда session не нужна.
+    parsed: готовый parse_org_page(html) этой страницы без капчи (разбор в пуле процессов).
+    """
+    stats: Dict[str, Any] = {"mode": "WEB"}
 
-    changed += set_if_needed(c, "Сайт", safe_str(contacts.get("site")), overwrite=overwrite)
+    oid = safe_str(getattr(c, "ID", ""))
+    if not oid.isdigit():
+        stats["skipped"] = "nondigit_oid"
+        return c, stats
 
-    tels = pick_n(contacts.get("telephones") or [], st.MAX_PHONES)
-    changed += set_if_needed(c, "Телефон_1", tels[0], overwrite=overwrite)
-    changed += set_if_needed(c, "Телефон_2", tels[1], overwrite=overwrite)
-    changed += set_if_needed(c, "Телефон_3", tels[2], overwrite=overwrite)
+    used_selenium = False
 
-    emails = pick_n(contacts.get("emails") or [], st.MAX_EMAILS)
-    changed += set_if_needed(c, "Email_1", emails[0], overwrite=overwrite)
-    changed += set_if_needed(c, "Email_2", emails[1], overwrite=overwrite)
-    changed += set_if_needed(c, "Email_3", emails[2], overwrite=overwrite)
+    overwrite = bool(st.WEB_FORCE_OVERWRITE)
 
-    changed += set_if_needed(c, "Рейтинг", rating_value, overwrite=overwrite)
-    changed += set_if_needed(c, "Количество_оценок", rating_count, overwrite=overwrite)   # <-- НОВОЕ
-    changed += set_if_needed(c, "Количество_отзывов", review_count, overwrite=overwrite)
+    if page is None:
+        page = http_get_org_page(session, oid, timeout_sec=st.WEB_TIMEOUT_SEC)
+    final_url, html = page
+    if parsed is None and requests_is_blocked(final_url, html):
+        # Chrome (секунды на страницу) — только если ему есть что дописать
+        if not overwrite and all(safe_str(v) for v in _web_needed_attrs(st.MAX_PHONES, st.MAX_EMAILS)(c)):
+            stats["skipped"] = "blocked_needed_filled"
+            return c, stats
+        html = pool.get_page_html(f"https://yandex.ru/maps/org/{oid}")
+        used_selenium = True
 
-    # Режим работы НЕ перезаписываем агрессивно (обычно он уже есть из выдачи)
-    changed += set_if_needed(c, "Режим_работы", worktime, overwrite=False)
+    if parsed is None:
+        parsed = parse_org_page(html, max_phones=st.MAX_PHONES)
+    contacts = parsed["contacts"]
+    rating_value = parsed["rating_value"]
+    rating_count = parsed["rating_count"]
+    review_count = parsed["review_count"]
+    worktime = parsed["worktime"]
+
+    # не больше MAX_PHONES/MAX_EMAILS значений, дополненных "" до числа колонок
+    tels = pick_n(contacts["telephones"][: st.MAX_PHONES], _WEB_CONTACT_COLS)
+    emails = pick_n(contacts["emails"][: st.MAX_EMAILS], _WEB_CONTACT_COLS)
+
+    # значения — в порядке _WEB_SET_ATTRS
+    new_values = (
+        contacts.get("site"),
+        *tels,
+        *emails,
+        rating_value,
+        rating_count,   # <-- НОВОЕ
+        review_count,
+        worktime,
+    )
+    changed = 0
+    # текущие значения всех полей — одним вызовом attrgetter
+    for attr, cur, new in zip(_WEB_SET_ATTRS, _get_web_set_attrs(c), new_values):
+        new = safe_str(new)
+        if not new or (safe_str(cur) and (not overwrite or attr in _WEB_KEEP_ATTRS)):
+            continue
+        setattr(c, attr, new)
+        changed += 1
 
     # raw_json trace
     try:
-        raw = {}
-        try:
-            raw = json.loads(safe_str(getattr(c, "raw_json", "")) or "{}")
-        except Exception:
-            raw = {"raw_json_parse_error": True, "raw_json_raw": safe_str(getattr(c, "raw_json", ""))[:200]}
-
-        if not isinstance(raw, dict):
-            raw = {"raw_json_not_dict": True}
-
-        raw["web_enrich"] = {
+        trace = {
             "ok": True,
             "used_selenium": used_selenium,
             "final_url": final_url,
@@ -474,7 +712,22 @@ def enrich_company_from_web(st: Settings, c: Company, pool: SeleniumPool, sessio
             "review_count": review_count,
             "changed": changed,
         }
-        setattr(c, "raw_json", json_dumps_safe(raw))
+        raw_json = safe_str(getattr(c, "raw_json", ""))
+        spliced = _raw_json_append_key(raw_json, "web_enrich", trace)
+        if spliced is not None:
+            setattr(c, "raw_json", spliced)
+        else:
+            raw = {}
+            try:
+                raw = json_loads(raw_json or "{}")
+            except Exception:
+                raw = {"raw_json_parse_error": True, "raw_json_raw": raw_json[:200]}
+
+            if not isinstance(raw, dict):
+                raw = {"raw_json_not_dict": True}
+
+            raw["web_enrich"] = trace
+            setattr(c, "raw_json", json_dumps_safe(raw))
     except Exception:
         pass
 
@@ -484,36 +737,148 @@ def enrich_company_from_web(st: Settings, c: Company, pool: SeleniumPool, sessio
     return c, stats
 
 
+def _fetch_org_pages(
+    st: Settings, oids: List[str]
+) -> Iterator[Tuple[Optional[Tuple[str, str]], Optional[Exception]]]:
+    """
+    http_get_org_page по списку oid. Результаты отдаются лениво, в порядке oids: ((final_url, html), None)
+    или (None, ошибка); для нецифрового oid — (None, None), его пропустит enrich_company_from_web.
+    Вызывающий разбирает страницу, пока следующие ещё грузятся; вперёд загружается не больше
+    2*WEB_WORKERS страниц, так что пока он ждёт Selenium/капчу, html в памяти не копятся.
+
+    Загрузки I/O-bound, поэтому идут в WEB_WORKERS потоков, у каждого потока своя
+    Session из new_web_session (как в pipeline._fetch_by_uris). SLEEP_SEC — минимальный интервал
+    между запросами, общий для всех потоков (RateLimiter).
+    """
+    import threading
+
+    limiter = RateLimiter(st.SLEEP_SEC)
+    local = threading.local()
+    sessions: List[requests.Session] = []
+
+    def fetch_one(oid: str) -> Tuple[Optional[Tuple[str, str]], Optional[Exception]]:
+        if not oid.isdigit():
+            return None, None
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = new_web_session()
+            sessions.append(session)
+        limiter.acquire()
+        try:
+            return http_get_org_page(session, oid, timeout_sec=st.WEB_TIMEOUT_SEC), None
+        except Exception as e:
+            return None, e
+
+    workers = max(1, min(int(st.WEB_WORKERS or 1), len(oids)))
+    try:
+        if workers == 1:
+            for oid in oids:
+                yield fetch_one(oid)
+            return
+
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        pending: deque = deque()
+        ex = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for oid in oids:
+                pending.append(ex.submit(fetch_one, oid))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # вызывающий бросил итерацию — ещё не начатые загрузки не нужны
+            ex.shutdown(wait=True, cancel_futures=True)
+    finally:
+        for session in sessions:
+            session.close()
+
+
+def _parse_org_pages_in_processes(
+    fetched: Iterator[Tuple[Optional[Tuple[str, str]], Optional[Exception]]], max_phones: int, workers: int
+) -> Iterator[Tuple[Optional[Tuple[str, str]], Optional[Exception], Optional[Dict[str, Any]]]]:
+    """
+    Разбор страниц из _fetch_org_pages (parse_org_page) в пуле процессов: bs4 упирается в CPU и GIL.
+    Отдаёт (page, ошибка загрузки, parsed) в исходном порядке; вперёд разбирается не больше 2*workers страниц.
+    parsed=None (капча, ошибка разбора, пул недоступен) — страницу целиком обработает enrich_company_from_web.
+    """
+    from collections import deque
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    def result(item: Tuple[Any, Any, Optional[Future]]) -> Tuple[Any, Any, Optional[Dict[str, Any]]]:
+        page, err, fut = item
+        parsed = None
+        if fut is not None:
+            try:
+                parsed = fut.result()
+            except Exception:
+                pass
+        return page, err, parsed
+
+    pending: deque = deque()
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for page, err in fetched:
+            fut = None
+            if page is not None and err is None:
+                try:
+                    fut = ex.submit(_parse_org_page_job, page, max_phones)
+                except (OSError, RuntimeError):  # нет процессов / пул сломан — разберёт основной процесс
+                    pass
+            pending.append((page, err, fut))
+            if len(pending) > 2 * workers:
+                yield result(pending.popleft())
+        while pending:
+            yield result(pending.popleft())
+
+
 def enrich_companies_web(st: Settings, companies: List[Company], pool: SeleniumPool) -> Dict[str, Any]:
+    """
+    Страницы организаций загружаются параллельно (_fetch_org_pages), разбор — в основном потоке
+    или в WEB_PARSE_PROCESSES процессах, запись в компании — в основном потоке по порядку, по мере загрузки; Selenium-fallback (капча) — тоже здесь, по одной.
+    stats["skipped"] — и организации, которые enrich_company_from_web пропустил (нецифровой ID;
+    капча, а нужные поля уже заполнены — Chrome не открывается): они не входят в success.
+    """
     stats: Dict[str, Any] = {"attempted": 0, "success": 0, "failed": 0, "skipped": 0, "errors": []}
-    done = 0
 
-    with requests.Session() as session:
-        for i, c in enumerate(companies, start=1):
-            if st.WEB_MAX_ITEMS > 0 and done >= st.WEB_MAX_ITEMS:
-                stats["skipped"] += 1
-                continue
+    todo: List[Tuple[int, str]] = []
+    for i, c in enumerate(companies):
+        if st.WEB_MAX_ITEMS > 0 and len(todo) >= st.WEB_MAX_ITEMS:
+            stats["skipped"] += 1
+            continue
 
-            oid = safe_str(getattr(c, "ID", ""))
-            if not oid:
-                stats["skipped"] += 1
-                continue
+        oid = safe_str(getattr(c, "ID", ""))
+        if not oid:
+            stats["skipped"] += 1
+            continue
 
-            done += 1
-            stats["attempted"] += 1
+        todo.append((i, oid))
 
-            if st.VERBOSE:
-                log(f"[ENRICH] {i}/{len(companies)} oid={oid} mode=WEB")
+    fetched = _fetch_org_pages(st, [oid for _i, oid in todo])
+    parse_workers = min(int(st.WEB_PARSE_PROCESSES or 1), available_cpus(), len(todo))
+    if parse_workers > 1:
+        parsed_pages = _parse_org_pages_in_processes(fetched, st.MAX_PHONES, parse_workers)
+    else:
+        parsed_pages = ((page, err, None) for page, err in fetched)
 
-            try:
-                newc, _ = enrich_company_from_web(st, c, pool, session)
-                companies[i - 1] = newc
-                stats["success"] += 1
-            except Exception as e:
-                stats["failed"] += 1
-                stats["errors"].append(f"{oid}: {e}")
+    for (i, oid), (page, fetch_err, parsed) in zip(todo, parsed_pages):
+        stats["attempted"] += 1
 
-            if st.SLEEP_SEC > 0:
-                time.sleep(float(st.SLEEP_SEC))
+        if st.VERBOSE:
+            log(f"[ENRICH] {i + 1}/{len(companies)} oid={oid} mode=WEB")
 
+        try:
+            if fetch_err is not None:
+                raise fetch_err
+            newc, one = enrich_company_from_web(st, companies[i], pool, None, page=page, parsed=parsed)
+            companies[i] = newc
+            # пропуск (нецифровой ID, капча при заполненных полях) — не успех
+            stats["skipped" if one.get("skipped") else "success"] += 1
+        except Exception as e:
+            stats["failed"] += 1
+            stats["errors"].append(f"{oid}: {e}")
+
+    # кеш _soup держит дерево последней страницы — после enrich оно не нужно
+    _soup.cache_clear()
     return stats
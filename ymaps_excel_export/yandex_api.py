@@ -2,23 +2,76 @@
 
 from __future__ import annotations
 
+import functools
+import random
 import time
-from typing import Any, Dict, List, Optional, Tuple
-
-import requests
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from .config import Settings
 from .models import Company
-from .utils import dedup_keep_order, json_dumps_safe, log, pick_n, safe_join, safe_str
+from .utils import RateLimiter, json_dumps_safe, json_loads, log, pick_n, safe_join, safe_str
+
+# requests импортируется лениво (≈50 мс): пайплайн импортирует модуль во всех MODE
+if TYPE_CHECKING:
+    import requests
 
 YMAPS_SEARCH_URL = "https://search-maps.yandex.ru/v1"
 _RETRY_STATUSES = {429, 500, 502, 503, 504}
+_RETRY_ATTEMPTS = 6
+# потолок паузы между повторами (и для Retry-After), сек
+_BACKOFF_MAX_SEC = 30.0
 
 API_MAX_SKIP = 1000
 
+# Простаивающие сессии Search API: search_bbox, fetch_by_uri и uri-requery (pipeline) берут
+# сессию на время работы и возвращают, поэтому keep-alive соединение (TCP+TLS) переживает вызов.
+# Сессия в каждый момент — у одного потока (Session не потокобезопасна); list.pop/append атомарны.
+_IDLE_SESSIONS: List[requests.Session] = []
+_IDLE_SESSIONS_MAX = 8
+
+
+def acquire_api_session() -> requests.Session:
+    try:
+        return _IDLE_SESSIONS.pop()
+    except IndexError:
+        import requests
+
+        return requests.Session()
+
+
+def release_api_session(session: requests.Session) -> None:
+    if len(_IDLE_SESSIONS) < _IDLE_SESSIONS_MAX:
+        _IDLE_SESSIONS.append(session)
+    else:
+        session.close()
+
+
+# Варианты написания ключей CompanyMetaData (в порядке приоритета)
+_POSTAL_KEYS = ("postalCode", "postalcode", "post")
+_REVIEW_COUNT_KEYS = ("reviewCount", "reviewcount")
+_RATING_COUNT_KEYS = ("ratingCount", "ratingcount", "ratingsCount", "ratingscount")
+
+
+def _first_truthy(d: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    # как d.get(k1) or d.get(k2) or ...: первое истинное значение, иначе значение последнего ключа
+    v = None
+    for k in keys:
+        v = d.get(k)
+        if v:
+            return v
+    return v
+
 
 def _format_rating_1(x: Any) -> str:
-    s = safe_str(x).replace(",", ".")
+    return _format_rating_1_cached(safe_str(x))
+
+
+@functools.lru_cache(maxsize=256)
+def _format_rating_1_cached(s: str) -> str:
+    """
+    Рейтинги в выдаче повторяются ("4.5", "4.7", ...), поэтому результат кешируется по строке.
+    """
+    s = s.replace(",", ".")
     if not s:
         return ""
     try:
@@ -28,53 +81,108 @@ def _format_rating_1(x: Any) -> str:
     return f"{v:.1f}".replace(".", ",")
 
 
-def _get_json_with_retries(session: requests.Session, *, params: Dict[str, Any], timeout_sec: int) -> Dict[str, Any]:
+def _retry_after_sec(r: requests.Response) -> Optional[float]:
+    """
+    Retry-After: секунды или HTTP-дата. None — заголовка нет или он не разбирается.
+    """
+    v = safe_str(r.headers.get("Retry-After"))
+    if not v:
+        return None
+    if v.isdigit():
+        return float(v)
+    from email.utils import parsedate_to_datetime
+
+    try:
+        dt = parsedate_to_datetime(v)
+    except (TypeError, ValueError):
+        return None
+    if dt is None or dt.tzinfo is None:
+        return None
+    return max(0.0, dt.timestamp() - time.time())
+
+
+def _retry_delay(backoff: float, r: Optional[requests.Response] = None) -> float:
+    """
+    Пауза перед повтором. 429 — Retry-After сервера, иначе backoff ±50%;
+    5xx / сетевые ошибки — случайно в [0, backoff]. Джиттер разводит повторы параллельных потоков.
+    """
+    if r is not None and r.status_code == 429:
+        ra = _retry_after_sec(r)
+        if ra is not None:
+            return min(ra, _BACKOFF_MAX_SEC)
+        return random.uniform(backoff * 0.5, backoff * 1.5)
+    return random.uniform(0.0, backoff)
+
+
+def _get_json_with_retries(
+    session: requests.Session,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    timeout_sec: int,
+    url: str = YMAPS_SEARCH_URL,
+) -> Dict[str, Any]:
+    """
+    url: готовый адрес с query (params=None) — так страницы search_bbox не кодируют параметры заново.
+    """
+    import requests
+
     backoff = 1.0
     last_err = None
 
-    for _attempt in range(1, 7):
+    for attempt in range(1, _RETRY_ATTEMPTS + 1):
+        # после последней попытки не ждём — сразу ошибка
+        last = attempt == _RETRY_ATTEMPTS
         try:
-            r = session.get(YMAPS_SEARCH_URL, params=params, timeout=timeout_sec)
+            r = session.get(url, params=params, timeout=timeout_sec)
 
             if r.status_code in _RETRY_STATUSES:
                 last_err = f"{r.status_code} {r.reason} {safe_str((r.text or '')[:300])}"
-                time.sleep(backoff)
-                backoff *= 2
+                if not last:
+                    time.sleep(_retry_delay(backoff, r))
+                backoff = min(backoff * 2, _BACKOFF_MAX_SEC)
                 continue
 
             if r.status_code >= 400:
                 raise requests.HTTPError(f"Yandex API error: HTTP {r.status_code} {r.reason}: {safe_str((r.text or '')[:300])}")
 
-            return r.json()
+            # байты тела — сразу в orjson (если есть), без декодирования в str
+            return json_loads(r.content)
 
         except (requests.Timeout, requests.ConnectionError) as e:
             last_err = str(e)
-            time.sleep(backoff)
-            backoff *= 2
+            if not last:
+                time.sleep(_retry_delay(backoff))
+            backoff = min(backoff * 2, _BACKOFF_MAX_SEC)
 
     raise requests.HTTPError(f"retry_failed: {last_err}")
 
 
-def parse_contacts_meta(meta: Dict[str, Any]) -> Tuple[List[str], List[str], List[str]]:
-    phones: List[str] = []
-    emails: List[str] = []
-    faxes: List[str] = []
+def parse_contacts_meta(
+    meta: Dict[str, Any],
+    max_phones: Optional[int] = None,
+    max_emails: Optional[int] = None,
+    max_faxes: Optional[int] = None,
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    max_*: сколько уникальных значений нужно вызывающему (None — все); лишние не собираются.
+    """
+    # dict как упорядоченное множество: дедуп сразу при добавлении
+    phones: Dict[str, None] = {}
+    emails: Dict[str, None] = {}
+    faxes: Dict[str, None] = {}
+    by_type = {"email": (emails, max_emails), "fax": (faxes, max_faxes)}
 
     for c in meta.get("Phones") or []:
         if not isinstance(c, dict):
             continue
         formatted = safe_str(c.get("formatted"))
-        ctype = safe_str(c.get("type")).lower()
         if not formatted:
             continue
-        if ctype == "email":
-            emails.append(formatted)
-        elif ctype == "fax":
-            faxes.append(formatted)
-        else:
-            phones.append(formatted)
+        bucket, cap = by_type.get(safe_str(c.get("type")).lower(), (phones, max_phones))
+        if cap is None or len(bucket) < cap:
+            bucket[formatted] = None
 
-    return dedup_keep_order(phones), dedup_keep_order(emails), dedup_keep_order(faxes)
+    return list(phones), list(emails), list(faxes)
 
 
 def parse_categories_meta(meta: Dict[str, Any]) -> List[str]:
@@ -85,7 +193,7 @@ def parse_categories_meta(meta: Dict[str, Any]) -> List[str]:
         n = safe_str(c.get("name"))
         if n:
             names.append(n)
-    return dedup_keep_order(names)
+    return list(dict.fromkeys(names))
 
 
 def parse_address_meta(meta: Dict[str, Any], props: Dict[str, Any]) -> Tuple[str, str]:
@@ -94,7 +202,7 @@ def parse_address_meta(meta: Dict[str, Any], props: Dict[str, Any]) -> Tuple[str
 
     addr_obj = meta.get("Address")
     if isinstance(addr_obj, dict):
-        postal = safe_str(addr_obj.get("postalCode") or addr_obj.get("postalcode") or addr_obj.get("post"))
+        postal = safe_str(_first_truthy(addr_obj, _POSTAL_KEYS))
         formatted = safe_str(addr_obj.get("formatted"))
         if not address and formatted:
             address = formatted
@@ -118,20 +226,25 @@ def parse_features_meta(meta: Dict[str, Any]) -> str:
     if not isinstance(feats, list) or not feats:
         return ""
 
-    out: List[str] = []
-    for f in feats:
-        if not isinstance(f, dict):
-            continue
-        name = safe_str(f.get("name") or f.get("id"))
-        value = f.get("value")
-        if name and value is not None:
-            out.append(f"{name}: {safe_str(value)}")
-        elif name:
-            out.append(name)
+    # "имя: значение" или просто имя; без имени (name/id) особенность пропускаем
+    out = [
+        f"{name}: {safe_str(value)}" if (value := f.get("value")) is not None else name
+        for f in feats
+        if isinstance(f, dict) and (name := safe_str(f.get("name") or f.get("id")))
+    ]
 
     return safe_join(out)
 
 
+def _feature_org_id(feature: Dict[str, Any]) -> str:
+    """
+    ID организации так же, как его берёт company_from_feature, но без сборки Company.
+    """
+    props = feature.get("properties")
+    meta = props.get("CompanyMetaData") if isinstance(props, dict) else None
+    return safe_str(meta.get("id")) if isinstance(meta, dict) else ""
+
+
 def company_from_feature(feature: Dict[str, Any], st: Settings) -> Optional[Company]:
     try:
         props = feature.get("properties") or {}
@@ -140,15 +253,19 @@ def company_from_feature(feature: Dict[str, Any], st: Settings) -> Optional[Comp
         geom = feature.get("geometry") or {}
         coords = (geom.get("coordinates") or []) if isinstance(geom, dict) else []
 
-        lon = safe_str(coords[0]) if len(coords) >= 1 else ""
-        lat = safe_str(coords[1]) if len(coords) >= 2 else ""
+        if len(coords) >= 2 and type(coords[0]) is float and type(coords[1]) is float:
+            # обычный случай — числа из JSON: str() и есть safe_str (пробелов нет)
+            lon, lat = str(coords[0]), str(coords[1])
+        else:
+            lon = safe_str(coords[0]) if len(coords) >= 1 else ""
+            lat = safe_str(coords[1]) if len(coords) >= 2 else ""
 
         org_id = safe_str(meta.get("id"))
         name = safe_str(meta.get("name") or props.get("name"))
 
         address, postal = parse_address_meta(meta, props)
 
-        phones, emails, faxes = parse_contacts_meta(meta)
+        phones, emails, faxes = parse_contacts_meta(meta, st.MAX_PHONES, st.MAX_EMAILS, st.MAX_FAXES)
         phones_cols = pick_n(phones, st.MAX_PHONES)
         emails_cols = pick_n(emails, st.MAX_EMAILS)
         faxes_cols = pick_n(faxes, st.MAX_FAXES)
@@ -165,15 +282,10 @@ def company_from_feature(feature: Dict[str, Any], st: Settings) -> Optional[Comp
         rating = _format_rating_1(meta.get("rating"))
 
         # reviewCount из API
-        reviewcount = safe_str(meta.get("reviewCount") or meta.get("reviewcount"))
+        reviewcount = safe_str(_first_truthy(meta, _REVIEW_COUNT_KEYS))
 
         # НОВОЕ: ratingCount из API (если внезапно отдают)
-        ratingcount = safe_str(
-            meta.get("ratingCount")
-            or meta.get("ratingcount")
-            or meta.get("ratingsCount")
-            or meta.get("ratingscount")
-        )
+        ratingcount = safe_str(_first_truthy(meta, _RATING_COUNT_KEYS))
 
         uri = safe_str(props.get("uri"))
 
@@ -241,18 +353,62 @@ def search_bbox(st: Settings, bbox: str) -> Tuple[List[Company], Dict[str, Any],
         "rspn": 1 if st.STRICT_BBOX else 0,
     }
 
-    with requests.Session() as session:
-        skip = 0
-        while skip <= API_MAX_SKIP and len(out) < max_total:
-            remaining = max_total - len(out)
-            cur_results = min(page_size, remaining)
-
-            params = dict(params_base)
-            params["results"] = cur_results
-            params["skip"] = skip
+    import threading
+    from collections import deque
+    from urllib.parse import urlencode
+
+    # общая часть query кодируется один раз; страница дописывает только results/skip
+    base_url = f"{YMAPS_SEARCH_URL}?{urlencode(params_base)}"
+
+    # Страницы грузятся в API_PAGE_WORKERS потоков (у каждого своя сессия), обрабатываются — по порядку.
+    # results/skip следующей страницы зависят от числа уникальных компаний (MAX_SKIP), поэтому вперёд
+    # запрашиваем только страницы, параметры которых уже точно известны: даже если все ожидающие
+    # страницы окажутся новыми, до max_total остаётся не меньше page_size. Где выдача кончается,
+    # заранее неизвестно: до workers-1 запросов уходят за последнюю страницу (поэтому по умолчанию 1).
+    limiter = RateLimiter(st.SLEEP_SEC)
+    local = threading.local()
+    sessions: List[requests.Session] = []
+
+    def fetch_page(skip: int, cur_results: int) -> Dict[str, Any]:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = acquire_api_session()
+            sessions.append(session)
+        url = f"{base_url}&results={cur_results}&skip={skip}"
+        limiter.acquire()
+        return _get_json_with_retries(session, url=url, timeout_sec=st.WEB_TIMEOUT_SEC)
+
+    workers = max(1, int(st.API_PAGE_WORKERS or 1))
+    ex = None
+    if workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+
+        ex = ThreadPoolExecutor(max_workers=workers)
+
+    # (skip, cur_results, future) запрошенных наперёд страниц
+    pending: deque = deque()
+    next_skip = 0
+    try:
+        while True:
+            if ex is not None:
+                # сколько компаний добавится максимум, если все ожидающие страницы — новые
+                ahead = len(out) + sum(r for _s, r, _f in pending)
+                while len(pending) < workers and next_skip <= API_MAX_SKIP and max_total - ahead >= page_size:
+                    pending.append((next_skip, page_size, ex.submit(fetch_page, next_skip, page_size)))
+                    next_skip += page_size
+                    ahead += page_size
+
+            if pending:
+                skip, cur_results, fut = pending.popleft()
+            else:
+                # наперёд ничего не запрошено (1 поток или хвост под MAX_SKIP) — как раньше, по одной
+                if not (next_skip <= API_MAX_SKIP and len(out) < max_total):
+                    break
+                skip, cur_results, fut = next_skip, min(page_size, max_total - len(out)), None
+                next_skip += cur_results
 
             try:
-                data = _get_json_with_retries(session, params=params, timeout_sec=st.WEB_TIMEOUT_SEC)
+                data = fut.result() if fut is not None else fetch_page(skip, cur_results)
             except Exception as e:
                 err = str(e)
                 break
@@ -265,6 +421,9 @@ def search_bbox(st: Settings, bbox: str) -> Tuple[List[Company], Dict[str, Any],
             for f in features:
                 if not isinstance(f, dict):
                     continue
+                # дубль не собираем: company_from_feature (и json_dumps_safe для raw_json) — только для новых
+                if _feature_org_id(f) in seen:
+                    continue
                 c = company_from_feature(f, st)
                 if not c or not c.ID:
                     continue
@@ -278,11 +437,18 @@ def search_bbox(st: Settings, bbox: str) -> Tuple[List[Company], Dict[str, Any],
             if st.VERBOSE:
                 log(f"[API] skip={skip} page_rows={len(rows)} total={len(out)}")
 
-            if len(features) < cur_results:
+            last_page = len(features) < cur_results
+            # страница уже в Company (raw_json — строка): разобранный JSON (в т.ч. в результате
+            # future) не держим, пока ждём следующую
+            del data, features, fut
+            if last_page:
                 break
-
-            skip += cur_results
-            time.sleep(st.SLEEP_SEC)
+    finally:
+        if ex is not None:
+            # страницы после последней нужной не ждём
+            ex.shutdown(wait=True, cancel_futures=True)
+        for session in sessions:
+            release_api_session(session)
 
     meta["total"] = len(out)
     meta["unique"] = len(seen)
@@ -290,7 +456,10 @@ def search_bbox(st: Settings, bbox: str) -> Tuple[List[Company], Dict[str, Any],
     return out, meta, err
 
 
-def fetch_by_uri(st: Settings, *, uri: str) -> Dict[str, Any]:
+def fetch_by_uri(st: Settings, *, uri: str, session: Optional[requests.Session] = None) -> Dict[str, Any]:
+    """
+    session: сессия вызывающего (keep-alive); без неё берётся из простаивающих (acquire_api_session).
+    """
     if not st.YMAPIKEY:
         raise RuntimeError("YMAPIKEY is empty")
 
@@ -303,5 +472,11 @@ def fetch_by_uri(st: Settings, *, uri: str) -> Dict[str, Any]:
         "skip": 0,
     }
 
-    with requests.Session() as session:
+    if session is not None:
         return _get_json_with_retries(session, params=params, timeout_sec=st.WEB_TIMEOUT_SEC)
+
+    own_session = acquire_api_session()
+    try:
+        return _get_json_with_retries(own_session, params=params, timeout_sec=st.WEB_TIMEOUT_SEC)
+    finally:
+        release_api_session(own_session)